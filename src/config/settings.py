@@ -1,6 +1,7 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, SecretStr
-from typing import Literal, List
+from typing import Literal, Tuple, Dict
+from functools import cached_property, lru_cache
 
 class Settings(BaseSettings):
     # System
@@ -12,6 +13,15 @@ class Settings(BaseSettings):
     SYMBOLS: str = "XAUUSD, GBPUSD, USDJPY" 
     TIMEFRAME: str = "H4"
     MAX_RISK_PER_TRADE: float = Field(0.01, ge=0.001, le=0.05)
+    # Max spread (pips): Gold/Commodities vs Forex, plus per-symbol overrides e.g. '{"XAUUSD": 4.5}'
+    SPREAD_LIMIT_GOLD: float = 5.0
+    SPREAD_LIMIT_FX: float = 3.0
+    SPREAD_LIMITS: Dict[str, float] = {}
+
+    # Runtime Loop
+    CYCLE_SECONDS: int = 900
+    # SessionManager's OPEN window: 07:00 UTC (London pre-market) to 21:00 UTC (NY afternoon)
+    TRADING_HOURS_UTC: Tuple[int, int] = (7, 21)
 
     # API Keys & Secrets
     GEMINI_API_KEY: SecretStr
@@ -23,14 +33,22 @@ class Settings(BaseSettings):
     TELEGRAM_BOT_TOKEN: SecretStr = SecretStr("")
     TELEGRAM_CHAT_ID: str = ""
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        extra = "ignore" 
+    # Frozen: settings are read-only after startup
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+        frozen=True
+    )
+
+    # Helper to convert "XAUUSD, GBPUSD" string into an immutable tuple (parsed once)
+    @cached_property
+    def symbol_list(self) -> Tuple[str, ...]:
+        return tuple(s.strip() for s in self.SYMBOLS.split(","))
 
-    # Helper to convert "XAUUSD, GBPUSD" string into a Python List
-    @property
-    def symbol_list(self) -> List[str]:
-        return [s.strip() for s in self.SYMBOLS.split(",")]
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Single validated Settings instance per process (env/.env parsed once)."""
+    return Settings()
 
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
\ No newline at end of file
@@ -2,205 +2,317 @@ import time
 import signal
 import sys
 import logging
+import json
+import copy
+import queue
+from logging.handlers import QueueHandler, QueueListener
 import threading
 import collections
-from datetime import datetime, timezone
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.config.settings import settings
 from src.modules.broker import MT5Broker
 from src.modules.brain import GeminiBrain
 from src.modules.market_data import AlphaModel
+from src.modules import indicators
 from src.modules.session_manager import SessionManager
 from src.modules.notifier import TelegramNotifier
 from src.modules.listener import TelegramListener
 import MetaTrader5 as mt5
+import numpy as np
 
 # --- LOGGING SETUP WITH MEMORY ---
 log_buffer = collections.deque(maxlen=50)
+log_lock = threading.Lock()
 
 class ListHandler(logging.Handler):
-    """Custom handler to capture logs for Telegram"""
-    def __init__(self, buffer):
+    """Custom handler to capture logs for Telegram (stores raw records; formatted only when read)"""
+    def __init__(self, buffer, lock):
         super().__init__()
         self.buffer = buffer
+        self.buffer_lock = lock
 
     def emit(self, record):
-        msg = self.format(record)
-        self.buffer.append(msg)
+        with self.buffer_lock:
+            self.buffer.append(record)
 
-handler = ListHandler(log_buffer)
+# Args of these types can't change after the call, so they are enqueued as-is
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None), np.generic)
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues the record unformatted: the %-merge (getMessage) and formatting
+    run on the listener thread. Mutable args are rendered with str() now, so a caller mutating
+    them after the log call can't change the message.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        args = record.args
+        if isinstance(args, dict):
+            record.args = {k: v if isinstance(v, _IMMUTABLE_ARGS) else str(v) for k, v in args.items()}
+        elif args:
+            record.args = tuple(a if isinstance(a, _IMMUTABLE_ARGS) else str(a) for a in args)
+        return record
+
+handler = ListHandler(log_buffer, log_lock)
 handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
 
-logging.basicConfig(
-    level=settings.LOG_LEVEL,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        handler
-    ]
-)
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+
+# Threads only enqueue records; formatting + buffering happen on the listener thread
+log_queue = queue.Queue(-1)
+queue_handler = LazyQueueHandler(log_queue)
+
+logging.basicConfig(level=settings.LOG_LEVEL, handlers=[queue_handler])
+log_listener = QueueListener(log_queue, stream_handler, handler)
+log_listener.start()
 logger = logging.getLogger(__name__)
 
+def _next_boundary_utc(period, cushion=2):
+    """Epoch seconds of the next UTC-aligned `period` bar close, plus a cushion for MT5 to commit the bar."""
+    return (time.time() // period + 1) * period + cushion
+
 class TradingBot:
+    __slots__ = (
+        'running', 'paused', '_stop_event', 'broker', 'brain', 'alpha', 'session', 'notifier', 'listener',
+        'memory', '_memory_lock', '_executor', 'start_time', 'cycles_run', 'error_count', '_cycle_cache', '_partial_taken', '_spread_limit'
+    )
+
     def __init__(self):
         self.running = True
         self.paused = False
+        self._stop_event = threading.Event()
         
         self.broker = MT5Broker()
-        self.brain = GeminiBrain()
+        self.brain = GeminiBrain(stop_event=self._stop_event)
         self.alpha = AlphaModel()
         self.session = SessionManager()
         self.notifier = TelegramNotifier()
         self.listener = TelegramListener(self) 
         
         self.memory = {}
+        self._memory_lock = threading.Lock()
+        # One long-lived pool for per-symbol fan-out (threads reused across cycles)
+        self._executor = ThreadPoolExecutor(max_workers=len(settings.symbol_list), thread_name_prefix="scan")
         self.start_time = time.time()
         self.cycles_run = 0
         self.error_count = 0
+        # Per-cycle snapshot of account/positions (one MT5 round-trip each per cycle)
+        self._cycle_cache = {}
+        # Tickets already partially closed (the open position's comment never shows it)
+        self._partial_taken = set()
+        # Spread limits resolved once per symbol
+        self._spread_limit = {
+            s: settings.SPREAD_LIMITS.get(s, settings.SPREAD_LIMIT_GOLD if ("XAU" in s or "GOLD" in s) else settings.SPREAD_LIMIT_FX)
+            for s in settings.symbol_list
+        }
 
     def get_recent_logs(self, n=15):
-        if not log_buffer: return "No logs yet."
-        return "\n".join(list(log_buffer)[-n:])
+        # Snapshot only the last n entries under the lock, then restore chronological order
+        with log_lock:
+            recent = list(itertools.islice(reversed(log_buffer), n))
+        if not recent: return "No logs yet."
+        return "\n".join(handler.format(r) for r in reversed(recent))
+
+    def refresh_cycle_cache(self):
+        self._cycle_cache = {
+            "acct": self.broker.get_account_info(),
+            "positions": self.broker.get_open_positions()
+        }
 
     def get_performance_metrics(self):
         return {
             "uptime": int(time.time() - self.start_time),
             "cycles": self.cycles_run,
             "errors": self.error_count,
-            "trades_managed": len(self.broker.get_open_positions()) if self.broker.connected else 0
+            "trades_managed": len(self.broker.get_open_positions(max_age=5)) if self.broker.connected else 0
         }
 
-    def is_trading_hours(self):
-        current_hour = datetime.now(timezone.utc).hour
-        # 07:00 UTC (08:00 WAT) to 22:00 UTC
-        if 7 <= current_hour < 22:
-            return True
-        return False
-
     def manage_positions(self):
-        open_trades = self.broker.get_open_positions()
-        for trade in open_trades:
-            symbol = trade.symbol
-            ticket = trade.ticket
-            entry = trade.price_open
-            curr = mt5.symbol_info_tick(symbol).bid if trade.type == 0 else mt5.symbol_info_tick(symbol).ask
-            
-            # PnL Calc
-            profit_points = curr - entry if trade.type == 0 else entry - curr
-            sl_dist = abs(entry - trade.sl) if trade.sl > 0 else 0
+        open_trades = self._cycle_cache["positions"]
+        # Forget closed tickets; known partials are skipped without an MT5 call
+        self._partial_taken &= {t.ticket for t in open_trades}
+        if not open_trades: return
+        # One tick per unique symbol, not per trade
+        ticks = {s: mt5.symbol_info_tick(s) for s in {t.symbol for t in open_trades}}
+        
+        # Vectorized R-multiples across the whole book (NaN price = no tick -> never triggers)
+        n = len(open_trades)
+        entry = np.fromiter((t.price_open for t in open_trades), dtype=np.float64, count=n)
+        sl = np.fromiter((t.sl for t in open_trades), dtype=np.float64, count=n)
+        is_buy = np.fromiter((t.type == 0 for t in open_trades), dtype=bool, count=n)
+        has_partial = np.fromiter((t.ticket in self._partial_taken for t in open_trades), dtype=bool, count=n)
+        curr = np.fromiter(
+            ((ticks[t.symbol].bid if t.type == 0 else ticks[t.symbol].ask) if ticks[t.symbol] else np.nan for t in open_trades),
+            dtype=np.float64, count=n
+        )
+        
+        # PnL Calc
+        profit_points = np.where(is_buy, curr - entry, entry - curr)
+        sl_dist = np.where(sl > 0, np.abs(entry - sl), 0.0)
+        r = np.where(sl_dist > 0, profit_points / np.maximum(sl_dist, 1e-12), 0.0)
+        is_at_be = np.where(is_buy, sl >= entry, sl <= entry)
+        
+        # Rule: BE at 1.2R / Rule: Partial at 1.0R
+        be_hits = (sl_dist > 0) & (r >= 1.2) & ~is_at_be
+        partial_hits = (sl_dist > 0) & (r >= 1.0) & ~has_partial
+        
+        # Only the (usually 0-2) trades needing action go back through Python
+        for i in np.flatnonzero(be_hits | partial_hits):
+            trade = open_trades[i]
+            symbol, ticket = trade.symbol, trade.ticket
             
-            if sl_dist > 0:
-                r = profit_points / sl_dist
-                is_at_be = (trade.sl >= entry) if trade.type == 0 else (trade.sl <= entry)
-                
-                # Rule: BE at 1.2R
-                if r >= 1.2 and not is_at_be:
-                     self.broker.modify_position(ticket, sl=entry, tp=trade.tp)
-                     self.notifier.send(f"🛡️ {symbol} -> Breakeven (R={r:.2f})")
-
-                # Rule: Partial at 1.0R
-                if r >= 1.0 and "Partial" not in trade.comment:
-                    vol = round(trade.volume * 0.4, 2)
-                    if vol >= 0.01:
-                        self.broker.close_partial(ticket, vol)
-                        self.notifier.send(f"💵 {symbol} Partial Taken")
+            if be_hits[i]:
+                 self.broker.modify_position(ticket, sl=entry[i], tp=trade.tp)
+                 self.notifier.send(f"🛡️ {symbol} -> Breakeven (R={r[i]:.2f})")
+
+            if partial_hits[i]:
+                # Too small to split, or already split before a restart (deal history): nothing left to take
+                vol = round(trade.volume * 0.4, 2)
+                if vol < 0.01 or self.broker.has_partial_close(ticket):
+                    self._partial_taken.add(ticket)
+                    continue
+                if self.broker.close_partial(ticket, vol):
+                    self._partial_taken.add(ticket)
+                    self.notifier.send(f"💵 {symbol} Partial Taken")
 
     def run_cycle(self):
         self.cycles_run += 1
         
-        self.session.update_session_status()
+        # Session state only changes at open/close boundaries
+        if time.time() >= self.session.next_transition_ts:
+            self.session.update_session_status()
         context = self.session.get_context()
 
         if context['session_status'] == "CLOSED":
-            if self.cycles_run % 12 == 0: 
-                logger.info("💤 Market Closed. Session Manager Asleep.")
+            logger.info("💤 Market Closed. Session Manager Asleep.")
             return
 
         if self.paused: return
 
+        self.refresh_cycle_cache()
+
         try:
             self.manage_positions()
         except Exception as e:
-            logger.error(f"Manager Error: {e}")
+            logger.error("Manager Error: %s", e)
 
-        for symbol in settings.symbol_list:
-            logger.info(f"Analyzing {symbol}...")
-            
+        # 1. MT5-only scan fans out across the pool
+        futures = {self._executor.submit(self._scan_symbol, s): s for s in settings.symbol_list}
+        packets = {}
+        for fut in as_completed(futures):
+            packet = fut.result()
+            if packet: packets[futures[fut]] = packet
+        if not packets: return
+
+        # 2. One Gemini call covers every symbol that survived the filters
+        acct = dict(self._cycle_cache["acct"])
+        trades_by_symbol = {}
+        for t in self._cycle_cache["positions"]:
+            if t.symbol in packets:
+                trades_by_symbol.setdefault(t.symbol, []).append({"ticket": t.ticket, "profit": t.profit, "type": t.type})
+        acct['open_trades_details'] = trades_by_symbol
+        decisions = self.brain.analyze_market_batch(packets, acct, previous_context=context)
+
+        # 3. Orders & alerts go out on the main thread so MT5 sends stay serialized
+        for symbol, decision in decisions.items():
             try:
-                data = self.broker.get_multi_timeframe_data(symbol)
-                if not data: continue
-                
-                live = self.broker.get_live_metrics(symbol)
-                spread = live.get('spread_pips', 100)
-                
-                # --- FLEXIBLE SPREAD LOGIC ---
-                # Gold/Commodities get 5.0 pips. Forex gets 3.0 pips.
-                if "XAU" in symbol or "GOLD" in symbol:
-                    max_spread = 5.0
-                else:
-                    max_spread = 3.0
-                
-                if spread > max_spread:
-                    logger.info(f"Skipping {symbol}: Spread {spread} > Limit {max_spread}")
-                    continue
-                # -----------------------------
+                self._dispatch(symbol, decision, packets[symbol], context)
+            except Exception as e:
+                logger.error("Execution Error: %s", e)
 
-                alpha_packet = self.alpha.get_market_state(data)
-                
-                if alpha_packet['final_alpha_score'] < 0.45:
-                    logger.info(f"{symbol}: Low Alpha ({alpha_packet['final_alpha_score']}). Skipping.")
-                    continue
+    def _scan_symbol(self, symbol):
+        """Worker-thread data/alpha pass for one symbol. Returns the alpha packet if it merits a brain call, else None."""
+        logger.info("Analyzing %s...", symbol)
+        
+        try:
+            # Cheap veto first: one tick read before any candle traffic
+            live = self.broker.get_live_metrics(symbol)
+            spread = live.get('spread_pips', 100)
+            
+            max_spread = self._spread_limit[symbol]
+            if spread > max_spread:
+                logger.info("Skipping %s: Spread %s > Limit %s", symbol, spread, max_spread)
+                return None
 
-                acct = self.broker.get_account_info()
-                raw_trades = self.broker.get_open_positions(symbol)
-                acct['open_trades_details'] = [{"ticket": t.ticket, "profit": t.profit, "type": t.type} for t in raw_trades]
-                
-                mem = self.memory.get(symbol, {})
-                decision = self.brain.analyze_market(alpha_packet, acct, previous_context=context)
-                self.memory[symbol] = {"plan": decision.get('plan'), "reasoning": decision.get('reasoning')}
-                
-                if decision['action'] in ["BUY", "SELL"]:
-                    if decision['action'] == "BUY" and context['locked_bias'] == "BEARISH":
-                        logger.warning(f"BLOCKED: AI tried BUY against BEARISH bias.")
-                        continue
-                    if decision['action'] == "SELL" and context['locked_bias'] == "BULLISH":
-                        logger.warning(f"BLOCKED: AI tried SELL against BULLISH bias.")
-                        continue
-
-                    msg = f"🚀 **{symbol} CALL**\nAction: {decision['action']}\nScore: {alpha_packet['final_alpha_score']}\nReason: {decision.get('reasoning')}"
-                    self.notifier.send(msg)
-                    self.broker.execute_trade(decision['action'], symbol, decision['stop_loss'], decision['take_profit'], decision.get('risk_percentage', 0.5))
-                else:
-                    logger.info(f"{symbol} HOLD: {decision.get('reasoning')}")
+            # Unchanged bars are cheap here: the broker probes before re-pulling and
+            # AlphaModel reuses its packet while the last bars are identical
+            data = self.broker.get_multi_timeframe_data(symbol)
+            if not data: return None
+            alpha_packet = self.alpha.get_market_state(data, symbol)
+            
+            if alpha_packet['final_alpha_score'] < 0.45:
+                logger.info("%s: Low Alpha (%s). Skipping.", symbol, alpha_packet['final_alpha_score'])
+                return None
+            return alpha_packet
 
-            except Exception as e:
-                if "429" in str(e):
-                    logger.warning("⚠️ API Quota. Cooling 60s...")
-                    time.sleep(60)
-                else:
-                    logger.error(f"Analysis Error: {e}")
+        except Exception as e:
+            logger.error("Analysis Error: %s", e)
+        return None
+
+    def _dispatch(self, symbol, decision, alpha_packet, context):
+        with self._memory_lock:
+            self.memory[symbol] = {"plan": decision.get('plan'), "reasoning": decision.get('reasoning')}
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s decision payload: %s", symbol, json.dumps(decision, default=str))
+        
+        if decision['action'] in ["BUY", "SELL"]:
+            if decision['action'] == "BUY" and context['locked_bias'] == "BEARISH":
+                logger.warning("BLOCKED: AI tried BUY against BEARISH bias.")
+                return
+            if decision['action'] == "SELL" and context['locked_bias'] == "BULLISH":
+                logger.warning("BLOCKED: AI tried SELL against BULLISH bias.")
+                return
+
+            # Order first; the alert is queued afterwards and never delays the fill
+            self.broker.execute_trade(decision['action'], symbol, decision['stop_loss'], decision['take_profit'], decision.get('risk_percentage', 0.5))
+            msg = f"🚀 **{symbol} CALL**\nAction: {decision['action']}\nScore: {alpha_packet['final_alpha_score']}\nReason: {decision.get('reasoning')}"
+            self.notifier.send(msg)
+        else:
+            logger.info("%s HOLD: %s", symbol, decision.get('reasoning'))
 
     def start(self):
         if not self.broker.connect():
             self.notifier.send("🚨 Broker Connect Fail")
+            self.notifier.flush()
             sys.exit(1)
         
+        # Pay the JIT compile / cache load now, before the first scan or /alpha
+        t0 = time.perf_counter()
+        indicators.warm_up()
+        logger.info("Indicator kernels ready in %.2fs", time.perf_counter() - t0)
+        
         self.notifier.send(f"✅ **QuantBot V6.3 Live**\nMode: Probabilistic Alpha\nPairs: {settings.SYMBOLS}")
         self.listener.start()
         
         while self.running:
             try:
                 self.run_cycle()
-                logger.info("Sleeping for 15 minutes...")
-                time.sleep(900) 
+                now = time.time()
+                if self.session.current_session == "CLOSED":
+                    # Nothing to do until the session re-opens
+                    wait = max(self.session.next_transition_ts - now, 60)
+                else:
+                    # Wake just after the next bar close on the CYCLE_SECONDS grid (:00/:15/:30/:45 by default,
+                    # which includes every H4 close), or at session close if sooner
+                    wait = max(min(_next_boundary_utc(settings.CYCLE_SECONDS), self.session.next_transition_ts) - now, 1)
+                logger.info("Sleeping for %ds...", wait)
+                self._stop_event.wait(wait)
             except Exception as e:
-                logger.error(f"Loop Error: {e}")
+                logger.error("Loop Error: %s", e)
                 self.error_count += 1
-                time.sleep(60)
+                self._stop_event.wait(60)
 
-    def shutdown(self, signum, frame):
+        self._executor.shutdown(wait=False, cancel_futures=True)
         self.notifier.send("🛑 Bot Shutdown")
+        self.notifier.flush()
+        log_listener.stop()
+
+    def shutdown(self, signum, frame):
+        # Wakes the main loop immediately; start() finishes the current cycle and exits cleanly
         self.running = False
-        sys.exit(0)
+        self._stop_event.set()
 
 if __name__ == "__main__":
     bot = TradingBot()
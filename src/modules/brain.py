@@ -1,52 +1,92 @@
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
 import json
+import hashlib
 import logging
+import os
+import re
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from src.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+def _decision_key(symbol: str, alpha_packet: dict, open_trades: list, previous_context: dict = None) -> bytes:
+    """Canonical hash of the prompt inputs that drive a decision (timestamps/prices excluded)."""
+    payload = {
+        "s": symbol,
+        "a": [alpha_packet['final_alpha_score'], alpha_packet['status'], alpha_packet['m5_metrics']['breakdown']],
+        "c": previous_context.get('locked_bias') if previous_context else None,
+        "t": sorted(t.get("ticket") for t in open_trades)
+    }
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode(), digest_size=16).digest()
+
+@lru_cache(maxsize=None)
+def _get_model(model_name: str):
+    """
+    Process-wide model handle. The gRPC transport keeps one long-lived HTTP/2 channel,
+    so TLS/connection setup is paid once rather than per call or per GeminiBrain instance.
+    """
+    genai.configure(api_key=settings.GEMINI_API_KEY.get_secret_value(), transport="grpc")
+    return genai.GenerativeModel(
+        model_name=model_name,
+        generation_config={"response_mime_type": "application/json"}
+    )
+
+STRATEGY_PATH = "strategy.xml"
+
+@lru_cache(maxsize=1)
+def _load_strategy_xml(path: str, mtime: float) -> str:
+    """Reads the strategy file with inter-tag whitespace stripped. mtime is part of the key, so edits invalidate it."""
+    with open(path, "r") as f:
+        return re.sub(r">\s+<", "><", f.read()).strip()
+
 class GeminiBrain:
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY.get_secret_value())
+    def __init__(self, stop_event=None):
         self.model_name = 'gemini-flash-latest'
-        self.model = genai.GenerativeModel(
-            model_name=self.model_name,
-            generation_config={"response_mime_type": "application/json"}
-        )
-        try:
-            with open("strategy.xml", "r") as f:
-                self.strategy_xml = f.read()
-        except:
-            self.strategy_xml = "Error: Logic file missing."
+        self.model = _get_model(self.model_name)
+        # Upper bound on one blocking Gemini call so a stalled request can't pin a scan worker
+        self.request_timeout = 60
+        self.max_retries = 8
+        # Set on shutdown: quota backoff gives up instead of holding the stop for minutes
+        self._stop = stop_event or threading.Event()
 
-    def analyze_market(self, alpha_packet: dict, account_data: dict, previous_context: dict = None) -> dict:
-        
-        session_instructions = "None"
-        if previous_context:
-            session_instructions = f"""
-            *** SESSION MANAGER ORDERS ***
-            - LOCKED BIAS: {previous_context.get('locked_bias')}
-            - INSTRUCTION: {previous_context.get('instruction')}
-            """
+        # Decision Memo: a HOLD on identical inputs is reused for up to one H1 bar. BUY/SELL carry
+        # absolute SL/TP prices, so they are never replayed
+        self.cache_size = 64
+        self.cache_ttl = 3600
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
 
-        prompt = f"""
-        Act as a Quant Trader analyzing Probabilistic Alpha.
-        
-        {session_instructions}
+        # Strategy file is hot-reloaded when its mtime changes (it is volume-mounted in docker-compose)
+        self._strategy_mtime = None
+        self.strategy_xml = ""
+        self._prompt_suffix = ""
+        self._refresh_strategy()
 
-        --- ALPHA DATA PACKET (FUZZY LOGIC) ---
-        Total Alpha Score: {alpha_packet['final_alpha_score']} / 1.0
-        Status: {alpha_packet['status']}
+    def _refresh_strategy(self):
+        try:
+            mtime = os.path.getmtime(STRATEGY_PATH)
+        except OSError:
+            mtime = None
+        if self._prompt_suffix and mtime == self._strategy_mtime: return
         
-        METRIC BREAKDOWN:
-        - Structure (35%): {alpha_packet['m5_metrics']['breakdown']['structure']} (Type: {alpha_packet['m5_metrics']['breakdown']['structure_type']})
-        - Reversion (30%): {alpha_packet['m5_metrics']['breakdown']['reversion']}
-        - Volatility (20%): {alpha_packet['m5_metrics']['breakdown']['volatility']}
-        - Momentum (15%): {alpha_packet['m5_metrics']['breakdown']['momentum']}
-
-        --- ACCOUNT ---
-        {json.dumps(account_data, indent=2)}
+        self._strategy_mtime = mtime
+        try:
+            self.strategy_xml = _load_strategy_xml(STRATEGY_PATH, mtime)
+        except OSError:
+            self.strategy_xml = "Error: Logic file missing."
+        self._prompt_suffix = self._build_prompt_suffix()
+        # Rules changed -> previous decisions no longer apply
+        with self._cache_lock:
+            self._cache.clear()
 
+    def _build_prompt_suffix(self) -> str:
+        """Static tail of every prompt (strategy XML + decision scaffolding), built once."""
+        return f"""
         --- STRATEGY RULES ---
         {self.strategy_xml}
 
@@ -56,20 +96,110 @@ class GeminiBrain:
         3. High Reversion Score (>0.7) = Price extended, look for mean reversion.
         4. MUST OBEY SESSION BIAS.
 
-        OUTPUT JSON:
+        OUTPUT JSON (one entry per symbol analyzed above):
         {{
-            "decision": {{
-                "action": "BUY" | "SELL" | "HOLD",
-                "risk_percentage": 0.5,
-                "stop_loss": 0.0,
-                "take_profit": 0.0,
-                "reasoning": "Alpha Score 0.85 driven by Structure Sweep..."
+            "decisions": {{
+                "<SYMBOL>": {{
+                    "action": "BUY" | "SELL" | "HOLD",
+                    "risk_percentage": 0.5,
+                    "stop_loss": 0.0,
+                    "take_profit": 0.0,
+                    "reasoning": "Alpha Score 0.85 driven by Structure Sweep..."
+                }}
             }}
         }}
         """
+
+    def analyze_market_batch(self, alpha_packets: dict, account_data: dict, previous_context: dict = None) -> dict:
+        """
+        Decides for every symbol in `alpha_packets` ({symbol: alpha_packet}) with ONE Gemini call.
+        `account_data['open_trades_details']` maps symbol -> list of light trade dicts (ticket/profit/type).
+        Returns {symbol: decision}.
+        """
+        self._refresh_strategy()
+        trades = account_data.get('open_trades_details', {})
+        keys = {
+            sym: _decision_key(sym, packet, trades.get(sym, []), previous_context)
+            for sym, packet in alpha_packets.items()
+        }
+
+        decisions, pending = {}, {}
+        now = time.monotonic()
+        with self._cache_lock:
+            for sym, key in keys.items():
+                hit = self._cache.get(key)
+                if hit and now - hit[0] < self.cache_ttl:
+                    self._cache.move_to_end(key)
+                    logger.info("Brain: cached decision reused for %s.", sym)
+                    decisions[sym] = dict(hit[1])
+                else:
+                    pending[sym] = alpha_packets[sym]
+
+        if not pending:
+            return decisions
+
+        fresh = self._query_model(pending, account_data, previous_context)
+        with self._cache_lock:
+            for sym, decision in fresh.items():
+                decisions[sym] = decision
+                if decision.get("action") != "HOLD" or decision.get("reasoning") == "AI Error": continue
+                self._cache[keys[sym]] = (time.monotonic(), dict(decision))
+                self._cache.move_to_end(keys[sym])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return decisions
+
+    def _query_model(self, alpha_packets: dict, account_data: dict, previous_context: dict = None) -> dict:
+        
+        session_instructions = "None"
+        if previous_context:
+            session_instructions = f"""
+            *** SESSION MANAGER ORDERS ***
+            - LOCKED BIAS: {previous_context.get('locked_bias')}
+            - INSTRUCTION: {previous_context.get('instruction')}
+            """
+
+        symbol_blocks = "".join(
+            f"""
+        --- {sym} ALPHA DATA PACKET (FUZZY LOGIC) ---
+        Total Alpha Score: {packet['final_alpha_score']} / 1.0
+        Status: {packet['status']}
+        
+        METRIC BREAKDOWN:
+        - Structure (35%): {packet['m5_metrics']['breakdown']['structure']} (Type: {packet['m5_metrics']['breakdown']['structure_type']})
+        - Reversion (30%): {packet['m5_metrics']['breakdown']['reversion']}
+        - Volatility (20%): {packet['m5_metrics']['breakdown']['volatility']}
+        - Momentum (15%): {packet['m5_metrics']['breakdown']['momentum']}
+"""
+            for sym, packet in alpha_packets.items()
+        )
+
+        prompt = f"""
+        Act as a Quant Trader analyzing Probabilistic Alpha.
+        Decide independently for each symbol: {", ".join(alpha_packets)}.
+        
+        {session_instructions}
+{symbol_blocks}
+        --- ACCOUNT ---
+        {json.dumps(account_data, separators=(',', ':'))}
+""" + self._prompt_suffix
+
+        fallback = {"action": "HOLD", "reasoning": "AI Error"}
         try:
-            response = self.model.generate_content(prompt)
-            return json.loads(response.text)['decision']
+            response = self._generate_with_backoff(prompt)
+            decisions = json.loads(response.text)['decisions']
+            return {sym: decisions.get(sym) or dict(fallback) for sym in alpha_packets}
         except Exception as e:
             logger.error(f"Brain Error: {e}")
-            return {"action": "HOLD", "reasoning": "AI Error"}
\ No newline at end of file
+            return {sym: dict(fallback) for sym in alpha_packets}
+
+    def _generate_with_backoff(self, prompt: str):
+        """Retries quota (429) errors with capped exponential backoff + jitter; other errors propagate."""
+        for attempt in range(self.max_retries):
+            try:
+                return self.model.generate_content(prompt, request_options={"timeout": self.request_timeout})
+            except ResourceExhausted:
+                if attempt == self.max_retries - 1: raise
+                delay = min(60, 2 ** attempt + random.uniform(0, 1))
+                logger.warning(f"⚠️ API Quota. Retry {attempt + 1}/{self.max_retries} in {delay:.1f}s...")
+                if self._stop.wait(delay): raise
\ No newline at end of file
@@ -1,113 +1,250 @@
 import MetaTrader5 as mt5
+import numpy as np
 import logging
+import functools
+import math
+import threading
+import time
 from datetime import datetime
+from types import SimpleNamespace
 from src.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Columns handed to the analyzer from MT5's structured rate arrays
+CANDLE_FIELDS = ("time", "open", "high", "low", "close", "tick_volume")
+# Prices are pinned to float64 at this boundary; time / tick_volume keep MT5's integer dtypes
+FIELD_DTYPES = {"open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64}
+
+# Bars pulled per timeframe. AlphaModel's longest lookback is EMA(50) / 50-bar ATR mean on M5 & H1,
+# so 200 bars leaves ~150 bars of EMA warm-up. Nothing reads H4, so it isn't pulled.
+BARS_PER_TF = {"H1": 200, "M5": 200}
+# Bars pulled when a new bar opens: enough to cover a few missed cycles, spliced onto the cache
+TAIL_BARS = 8
+
+# Comment prefix stamped on the partial-close DEAL ("PARTIAL#<ticket>"). The remaining position keeps
+# its opening comment, so this is for the history only: use has_partial_close() to test a position
+PARTIAL_TAG = "PARTIAL"
+
+def _ensure_connected(default, retry=False):
+    """
+    Broker method guard. Fast path is a single bool check.
+    Connects lazily; for read methods (retry=True) a None result on a dead terminal
+    triggers one reconnect + retry. Order-sending methods never retry.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if not self.connected and not self.connect(): return default
+            result = fn(self, *args, **kwargs)
+            if retry and result is None and mt5.terminal_info() is None:
+                logger.warning("MT5 terminal dropped. Reconnecting...")
+                self.connected = False
+                if not self.connect(): return default
+                result = fn(self, *args, **kwargs)
+            return default if result is None else result
+        return wrapper
+    return deco
+
+def _filling_mode(info):
+    """Order filling type the symbol actually accepts (IOC preferred, then FOK, else RETURN)."""
+    if info.filling_mode & mt5.SYMBOL_FILLING_IOC: return mt5.ORDER_FILLING_IOC
+    if info.filling_mode & mt5.SYMBOL_FILLING_FOK: return mt5.ORDER_FILLING_FOK
+    return mt5.ORDER_FILLING_RETURN
+
 class MT5Broker:
+    __slots__ = ('connected', '_mt5_lock', '_candle_cache', '_positions_cache', '_positions_ts', '_sym_meta')
+
     def __init__(self):
         self.connected = False
+        # MT5 order_send is not thread-safe; tick/info reads are
+        self._mt5_lock = threading.Lock()
+        # (symbol, timeframe) -> last columnar candles
+        self._candle_cache = {}
+        # Short-lived snapshot of all open positions; dropped on any order we send
+        self._positions_cache = None
+        self._positions_ts = 0.0
+        # symbol -> static contract specs (filled on connect)
+        self._sym_meta = {}
 
     def connect(self) -> bool:
         if not mt5.initialize(): return False
         if not mt5.login(settings.MT5_LOGIN, settings.MT5_PASSWORD.get_secret_value(), settings.MT5_SERVER): return False
+        # (Re)select traded symbols so ticks/rates are available right after a reconnect
+        for symbol in settings.symbol_list:
+            mt5.symbol_select(symbol, True)
+            self._load_symbol_meta(symbol)
         self.connected = True
         return True
 
+    @_ensure_connected(None, retry=True)
     def get_multi_timeframe_data(self, symbol: str):
-        if not self.connected and not self.connect(): return None
         # NEW: Added M5 for Scalping
         timeframes = {
-            "H4": mt5.TIMEFRAME_H4, 
             "H1": mt5.TIMEFRAME_H1, 
             "M5": mt5.TIMEFRAME_M5
         }
         data = {}
         for name, tf in timeframes.items():
-            candles = mt5.copy_rates_from_pos(symbol, tf, 0, 300)
-            if candles is None: return None
-            data[name] = candles
+            cols = self._get_rates(symbol, name, tf)
+            if cols is None: return None
+            data[name] = cols
         return data
 
+    def _get_rates(self, symbol, name, tf):
+        """Columnar candles for one timeframe; the full history is only pulled on first use or after a gap."""
+        key = (symbol, name)
+        cached = self._candle_cache.get(key)
+        if cached is not None:
+            probe = mt5.copy_rates_from_pos(symbol, tf, 0, 1)
+            if probe is None: return None
+            last = probe[-1]
+            if last['time'] == cached['time'][-1]:
+                # No tick since last pull: hand back the very same arrays, nothing to copy
+                if all(last[f] == cached[f][-1] for f in CANDLE_FIELDS): return cached
+                # Same forming bar: refresh just its OHLCV from the probe (copy, callers may still hold the old view)
+                cols = {f: cached[f].copy() for f in CANDLE_FIELDS}
+                for f in CANDLE_FIELDS: cols[f][-1] = last[f]
+                self._candle_cache[key] = cols
+                return cols
+
+            # New bar(s): pull a short tail and splice it on, provided it overlaps what we hold
+            # (the overlap also finalizes the bar that was forming last time). New arrays, never
+            # in-place: other threads may still be reading the previous ones.
+            tail = mt5.copy_rates_from_pos(symbol, tf, 0, TAIL_BARS)
+            if tail is not None and len(tail) and tail[0]['time'] <= cached['time'][-1]:
+                keep = int(np.searchsorted(cached['time'], tail[0]['time']))
+                n = BARS_PER_TF[name]
+                cols = {f: np.concatenate((cached[f][:keep], tail[f]))[-n:] for f in CANDLE_FIELDS}
+                self._candle_cache[key] = cols
+                return cols
+
+        candles = mt5.copy_rates_from_pos(symbol, tf, 0, BARS_PER_TF[name])
+        if candles is None: return None
+        # Columnar (SoA) view: one contiguous array per field for vectorized math downstream
+        cols = {f: np.ascontiguousarray(candles[f], dtype=FIELD_DTYPES.get(f)) for f in CANDLE_FIELDS}
+        self._candle_cache[key] = cols
+        return cols
+
+    def _load_symbol_meta(self, symbol: str):
+        """Caches the contract specs that don't change intra-session (tick VALUE does, so it is read live)."""
+        info = mt5.symbol_info(symbol)
+        if not info: return None
+        meta = SimpleNamespace(
+            point=info.point, digits=info.digits,
+            pip_size=info.point * 10 if info.digits in [3, 5] else info.point,
+            tick_size=info.trade_tick_size,
+            volume_min=info.volume_min, volume_max=info.volume_max, volume_step=info.volume_step,
+            # Market-order skeleton; execute_trade only fills in the per-trade fields
+            order_template={
+                "action": mt5.TRADE_ACTION_DEAL, "symbol": symbol, "magic": 234000, "comment": "AI-Quant-V6",
+                "type_time": mt5.ORDER_TIME_GTC, "type_filling": _filling_mode(info)
+            }
+        )
+        self._sym_meta[symbol] = meta
+        return meta
+
     def get_live_metrics(self, symbol: str):
         tick = mt5.symbol_info_tick(symbol)
-        info = mt5.symbol_info(symbol)
-        if not tick or not info: return {}
-        pip_size = info.point * 10 if info.digits in [3, 5] else info.point
+        meta = self._sym_meta.get(symbol) or self._load_symbol_meta(symbol)
+        # No quote (ask == 0) means the symbol isn't trading right now
+        if not tick or not meta or tick.ask == 0: return {}
         return {
-            "spread_pips": round((tick.ask - tick.bid)/pip_size, 2),
-            "ask": tick.ask, "bid": tick.bid, "point": info.point
+            "spread_pips": round((tick.ask - tick.bid)/meta.pip_size, 2),
+            "ask": tick.ask, "bid": tick.bid, "point": meta.point
         }
 
     def get_account_info(self):
         info = mt5.account_info()
         return {"balance": info.balance, "equity": info.equity} if info else {}
 
-    def get_open_positions(self, symbol: str = None):
-        if not self.connected and not self.connect(): return []
-        return (mt5.positions_get(symbol=symbol) if symbol else mt5.positions_get()) or []
+    @_ensure_connected([])
+    def get_open_positions(self, symbol: str = None, max_age: float = 2.0):
+        # One positions_get for everything; per-symbol views are filtered locally
+        now = time.monotonic()
+        if self._positions_cache is None or now - self._positions_ts >= max_age:
+            self._positions_cache = mt5.positions_get() or ()
+            self._positions_ts = now
+        if symbol: return [p for p in self._positions_cache if p.symbol == symbol]
+        return self._positions_cache
 
+    @_ensure_connected(False)
+    def has_partial_close(self, ticket):
+        """True if the still-open position `ticket` already has an exit deal, i.e. part of it was closed."""
+        deals = mt5.history_deals_get(position=ticket)
+        return any(d.entry == mt5.DEAL_ENTRY_OUT for d in deals) if deals else False
+
+    @_ensure_connected([])
     def get_recent_deals(self, start_timestamp):
-        if not self.connected and not self.connect(): return []
         start_dt = datetime.fromtimestamp(start_timestamp)
         deals = mt5.history_deals_get(start_dt, datetime.now())
         return [d for d in deals if d.entry == mt5.DEAL_ENTRY_OUT] if deals else []
 
     def calculate_lot_size(self, symbol, risk_pct, sl_price, entry_price):
         account = mt5.account_info()
+        meta = self._sym_meta.get(symbol) or self._load_symbol_meta(symbol)
+        # Not cached in meta: tick VALUE is the account-currency worth of one tick, so on crosses
+        # (e.g. EURGBP on a USD account) it moves with the quote->account rate all session
         symbol_info = mt5.symbol_info(symbol)
-        if not account or not symbol_info: return 0.01
+        if not account or not meta or not symbol_info: return 0.01
         
-        risk_amount = account.balance * (risk_pct / 100)
-        sl_dist = abs(entry_price - sl_price)
-        if sl_dist == 0: return 0.01
+        # Zero-distance stop or a zero tick value (some brokers / off-session) must neither raise
+        # nor fall through to a volume_max-sized position: smallest tradable size instead
+        loss_per_lot = abs(entry_price - sl_price) * symbol_info.trade_tick_value
+        if not loss_per_lot > 0: return meta.volume_min
         
-        tick_val = symbol_info.trade_tick_value
-        tick_size = symbol_info.trade_tick_size
-        raw_lot = risk_amount / (sl_dist / tick_size * tick_val)
+        # lots = risk$ * tick_size / (sl_dist * tick_value)  (single division)
+        raw_lot = account.balance * risk_pct * 0.01 * meta.tick_size / loss_per_lot
         
-        step = symbol_info.volume_step
-        return max(symbol_info.volume_min, min(round(raw_lot / step) * step, symbol_info.volume_max))
+        # Floor to the step: rounding up would risk more than risk_pct
+        step = meta.volume_step
+        lots = round(math.floor(raw_lot / step + 1e-9) * step, 8)
+        return max(meta.volume_min, min(lots, meta.volume_max))
 
     def modify_position(self, ticket, sl=None, tp=None):
         req = {"action": mt5.TRADE_ACTION_SLTP, "position": ticket, "sl": float(sl) if sl else 0.0, "tp": float(tp) if tp else 0.0, "magic": 234000}
-        mt5.order_send(req)
+        with self._mt5_lock: mt5.order_send(req)
+        self._positions_cache = None
 
     def close_partial(self, ticket, volume_to_close):
+        """Closes `volume_to_close` lots of position `ticket`. True if the deal went through."""
         pos = mt5.positions_get(ticket=ticket)
-        if not pos: return
+        if not pos: return False
         pos = pos[0]
         type_close = mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
-        price = mt5.symbol_info_tick(pos.symbol).bid if type_close == mt5.ORDER_TYPE_SELL else mt5.symbol_info_tick(pos.symbol).ask
-        req = {"action": mt5.TRADE_ACTION_DEAL, "position": ticket, "symbol": pos.symbol, "volume": volume_to_close, "type": type_close, "price": price, "magic": 234000}
-        mt5.order_send(req)
+        tick = mt5.symbol_info_tick(pos.symbol)
+        if not tick: return False
+        price = tick.bid if type_close == mt5.ORDER_TYPE_SELL else tick.ask
+        req = {"action": mt5.TRADE_ACTION_DEAL, "position": ticket, "symbol": pos.symbol, "volume": volume_to_close, "type": type_close, "price": price, "magic": 234000, "comment": f"{PARTIAL_TAG}#{ticket}"}
+        with self._mt5_lock: res = mt5.order_send(req)
+        self._positions_cache = None
+        return bool(res and res.retcode == mt5.TRADE_RETCODE_DONE)
 
+    @_ensure_connected(None)
     def execute_trade(self, action, symbol, sl, tp, risk_pct):
-        if not self.connected and not self.connect(): return
         tick = mt5.symbol_info_tick(symbol)
-        if not tick: return
+        meta = self._sym_meta.get(symbol) or self._load_symbol_meta(symbol)
+        if not tick or not meta: return
         price = tick.ask if action == "BUY" else tick.bid
         volume = self.calculate_lot_size(symbol, risk_pct, sl, price)
         
         order_type = mt5.ORDER_TYPE_BUY if action == "BUY" else mt5.ORDER_TYPE_SELL
-        req = {
-            "action": mt5.TRADE_ACTION_DEAL, "symbol": symbol, "volume": volume, "type": order_type, "price": price, 
-            "sl": float(sl), "tp": float(tp), "magic": 234000, "comment": "AI-Quant-V6", "type_time": mt5.ORDER_TIME_GTC, "type_filling": mt5.ORDER_FILLING_IOC
-        }
-        res = mt5.order_send(req)
-        if res and res.retcode == mt5.TRADE_RETCODE_DONE: logger.info(f"Executed: {res.order}")
-        else: logger.error(f"Failed: {res.comment if res else 'None'}")
+        req = {**meta.order_template, "volume": volume, "type": order_type, "price": price, "sl": float(sl), "tp": float(tp)}
+        with self._mt5_lock: res = mt5.order_send(req)
+        self._positions_cache = None
+        if res and res.retcode == mt5.TRADE_RETCODE_DONE: logger.info("Executed: %s", res.order)
+        else: logger.error("Failed: %s", res.comment if res else None)
     
+    @_ensure_connected(False)
     def verify_execution_capability(self, symbol):
         # Kept for /test command
-        if not self.connected and not self.connect(): return False
         tick = mt5.symbol_info_tick(symbol)
         if not tick: return False
         price = tick.ask * 0.90
         req = {"action": mt5.TRADE_ACTION_PENDING, "symbol": symbol, "volume": 0.01, "type": mt5.ORDER_TYPE_BUY_LIMIT, "price": price, "magic": 999999}
-        res = mt5.order_send(req)
-        if res and res.retcode == mt5.TRADE_RETCODE_DONE:
-            mt5.order_send({"action": mt5.TRADE_ACTION_REMOVE, "order": res.order})
-            return True
+        with self._mt5_lock:
+            res = mt5.order_send(req)
+            if res and res.retcode == mt5.TRADE_RETCODE_DONE:
+                mt5.order_send({"action": mt5.TRADE_ACTION_REMOVE, "order": res.order})
+                return True
         return False
\ No newline at end of file
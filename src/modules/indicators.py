@@ -0,0 +1,52 @@
+import numpy as np
+from numba import njit
+
+# --- JIT KERNELS ---
+# Plain float64 arrays in, so they can be called on the columnar candle arrays
+# directly. cache=True keeps compiled code across restarts;
+# nogil=True lets the scan threads run them concurrently.
+
+@njit(cache=True, nogil=True)
+def ema_last(close, length):
+    """
+    Last EMA value, same convention as pandas_ta's default: SMA of the first `length` closes as seed,
+    then alpha = 2 / (length + 1). Series never materialized; NaN if the window is shorter.
+    """
+    n = close.shape[0]
+    if n < length: return np.nan
+    alpha = 2.0 / (length + 1)
+    prev = close[:length].mean()
+    for i in range(length, n):
+        prev = prev + alpha * (close[i] - prev)
+    return prev
+
+@njit(cache=True, nogil=True)
+def atr_tail(high, low, close, length, tail):
+    """
+    Last `tail` ATR values plus the final (num, den) of the recurrence, so later bars can be folded in.
+    Same convention as pandas_ta's default: RMA (Wilder, alpha=1/length) of the True Range,
+    via the adjusted EWM recurrence; first `length` bars NaN.
+    """
+    n = close.shape[0]
+    k = min(tail, n)
+    start = n - k
+    out = np.full(k, np.nan)
+    decay = 1.0 - 1.0 / length
+    num = 0.0
+    den = 0.0
+    for i in range(1, n):
+        tr = max(abs(high[i] - low[i]), abs(high[i] - close[i - 1]), abs(close[i - 1] - low[i]))
+        num = tr + decay * num
+        den = 1.0 + decay * den
+        if i >= start and i >= length:
+            out[i - start] = num / den
+    return out, num, den
+
+def warm_up():
+    """
+    Compiles (or loads from the on-disk cache) the kernels the live path calls (IndicatorCache
+    warm-up and the short-window fallback), so the first scan after startup doesn't stall on the JIT.
+    """
+    x = np.linspace(1.0, 2.0, 64)
+    ema_last(x, 9)
+    atr_tail(x + 0.1, x - 0.1, x, 14, 49)
@@ -1,19 +1,55 @@
 import threading
 import time
+import random
 import requests
 import logging
-import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.config.settings import settings
+from src.modules.notifier import TG_SESSION
 
 logger = logging.getLogger(__name__)
 
+# orjson is optional: faster getUpdates parsing when installed, stdlib otherwise (both take bytes)
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# Static reply, built once
+HELP_TEXT = (
+    " **QUANT COMMANDER V6**\n\n"
+    " **Insight**\n"
+    "/status - Session Bias & Market Hours\n"
+    "/alpha - Live Probabilistic Score\n"
+    "/positions - Open Trades & PnL\n"
+    "/balance - Equity Health\n\n"
+    " **Control**\n"
+    "/pause - Suspend Trading\n"
+    "/resume - Resume Trading\n"
+    "/reset -  Reset Session Bias\n"
+    "/test -  Connectivity Test\n"
+    "/logs - View Recent Logs"
+)
+
 class TelegramListener:
-    def __init__(self, bot_instance):
+    ALIASES = {"/start": "/help"}
+
+    def __init__(self, bot_instance, session=None):
         self.bot = bot_instance
         self.token = settings.TELEGRAM_BOT_TOKEN.get_secret_value()
-        self.session = requests.Session()
+        self.session = session or TG_SESSION
         self.offset = 0
         self.running = False
+        self._cache = {} # key -> (ts, value), see _cached
+        self._pool = ThreadPoolExecutor(max_workers=min(8, len(settings.symbol_list)), thread_name_prefix="alpha")
+
+        # Command -> bound handler, resolved once
+        self._commands = {
+            "/help": self._cmd_help, "/status": self._cmd_status, "/alpha": self._cmd_alpha,
+            "/reset": self._cmd_reset, "/positions": self._cmd_positions, "/balance": self._cmd_balance,
+            "/logs": self._cmd_logs, "/test": self._cmd_test, "/pause": self._cmd_pause, "/resume": self._cmd_resume
+        }
 
     def start(self):
         self.running = True
@@ -24,25 +60,52 @@ class TelegramListener:
     def _poll_updates(self):
         logger.info("Telegram Command Center Active...")
         url = f"https://api.telegram.org/bot{self.token}/getUpdates"
+        failures = 0 # consecutive, drives the backoff
         
         while self.running:
             try:
-                # Long polling for responsiveness
-                resp = self.session.get(url, params={"offset": self.offset, "timeout": 30}, timeout=35)
-                data = resp.json()
+                # Long polling for responsiveness (25s server hold, 10s connect / 40s read on our side)
+                resp = self.session.get(url, params={"offset": self.offset, "timeout": 25}, timeout=(10, 40))
+                if resp.status_code >= 400:
+                    logger.warning(f"Listener HTTP {resp.status_code}: {resp.text[:200]}")
+                    failures = self._backoff(failures)
+                    continue
+                data = json_loads(resp.content)
+                failures = 0
                 
+                # No sleep between polls: the long-poll itself is the throttle
                 if data.get("ok"):
                     for u in data["result"]:
                         self.offset = u["update_id"] + 1
                         self._handle_message(u.get("message", {}))
-                
-                time.sleep(0.5)
 
-            except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError):
+            except requests.exceptions.ReadTimeout:
+                # Benign on long-polls: just re-poll
                 continue
+            except requests.exceptions.ConnectionError:
+                # Quiet, but an outage must not turn into a tight reconnect loop
+                failures = self._backoff(failures)
+            except ValueError as e:
+                logger.warning(f"Listener Bad JSON: {e}")
+                failures = self._backoff(failures)
             except Exception as e:
                 logger.error(f"Listener Error: {e}")
-                time.sleep(5)
+                failures = self._backoff(failures)
+
+    @staticmethod
+    def _backoff(failures):
+        """Exponential backoff with jitter (1s, 2s, 4s ... capped at 60s). Returns the new failure count."""
+        time.sleep(min(60, 2 ** failures) + random.uniform(0, 1))
+        return failures + 1
+
+    def _cached(self, key, ttl, fn):
+        """Short-lived memo so repeated taps on the same command don't each hit MT5."""
+        now = time.monotonic()
+        hit = self._cache.get(key)
+        if hit and now - hit[0] < ttl: return hit[1]
+        value = fn()
+        self._cache[key] = (now, value)
+        return value
 
     def _handle_message(self, message):
         text = message.get("text", "").lower().strip()
@@ -52,110 +115,107 @@ class TelegramListener:
         if chat_id != settings.TELEGRAM_CHAT_ID:
             return
 
-        # --- COMMANDS ---
-
-        if text == "/help" or text == "/start":
-            msg = (
-                " **QUANT COMMANDER V6**\n\n"
-                " **Insight**\n"
-                "/status - Session Bias & Market Hours\n"
-                "/alpha - Live Probabilistic Score\n"
-                "/positions - Open Trades & PnL\n"
-                "/balance - Equity Health\n\n"
-                " **Control**\n"
-                "/pause - Suspend Trading\n"
-                "/resume - Resume Trading\n"
-                "/reset -  Reset Session Bias\n"
-                "/test -  Connectivity Test\n"
-                "/logs - View Recent Logs"
-            )
-            self.bot.notifier.send(msg)
+        text = self.ALIASES.get(text, text)
+        handler = self._commands.get(text)
+        if handler: handler()
+
+    # --- COMMANDS ---
+
+    def _cmd_help(self):
+        self.bot.notifier.send(HELP_TEXT)
+
+    def _cmd_status(self):
+        # Real-time Session Context
+        ctx = self.bot.session.get_context()
+        hour = int(time.time() // 3600 % 24) # UTC hour straight from the epoch
+        start_hour, end_hour = settings.TRADING_HOURS_UTC # same window SessionManager trades
+        mkt_status = "🟢 OPEN" if start_hour <= hour < end_hour else "💤 CLOSED"
+        
+        msg = (
+            f"✅ **System Status**\n"
+            f"Market: {mkt_status}\n"
+            f"Bot State: {'▶️ RUNNING' if not self.bot.paused else '⏸️ PAUSED'}\n"
+            f"-------------------\n"
+            f" **Session Manager**\n"
+            f"Bias: {ctx.get('locked_bias', 'NEUTRAL')}\n"
+            f"Mode: {ctx.get('session_status', 'WAITING')}"
+        )
+        self.bot.notifier.send(msg)
+
+    def _cmd_alpha(self):
+        # On-Demand Alpha Calculation (Runs the Math Engine instantly)
+        self.bot.notifier.send("🧮 Calculating Live Alpha...")
+        
+        # Fetch + score every symbol concurrently; replies are sent from here, as each finishes
+        futures = [self._pool.submit(self._alpha_one, symbol) for symbol in settings.symbol_list]
+        for f in as_completed(futures):
+            try:
+                self.bot.notifier.send(f.result())
+            except Exception as e:
+                logger.error(f"Alpha Scan Error: {e}")
 
-        elif text == "/status":
-            # Real-time Session Context
-            ctx = self.bot.session.get_context()
-            hour = datetime.datetime.now(datetime.timezone.utc).hour
-            mkt_status = "🟢 OPEN" if 7 <= hour < 22 else "💤 CLOSED"
-            
-            msg = (
-                f"✅ **System Status**\n"
-                f"Market: {mkt_status}\n"
-                f"Bot State: {'▶️ RUNNING' if not self.bot.paused else '⏸️ PAUSED'}\n"
-                f"-------------------\n"
-                f" **Session Manager**\n"
-                f"Bias: {ctx.get('locked_bias', 'NEUTRAL')}\n"
-                f"Mode: {ctx.get('session_status', 'WAITING')}"
-            )
+    def _alpha_one(self, symbol):
+        data = self.bot.broker.get_multi_timeframe_data(symbol)
+        if not data: return f"⚠️ {symbol}: No Data"
+        
+        # Run the Alpha Model
+        state = self.bot.alpha.get_market_state(data, symbol)
+        
+        # Format the output
+        score = state['final_alpha_score']
+        bd = state['m5_metrics']['breakdown']
+        
+        return (
+            f" **{symbol} Alpha Scan**\n"
+            f"Score: **{score}/1.0** ({state['status']})\n"
+            f"-------------------\n"
+            f" Structure: {bd['structure']} ({bd['structure_type']})\n"
+            f"↩ Reversion: {bd['reversion']}\n"
+            f" Volatility: {bd['volatility']}\n"
+            f" Momentum: {bd['momentum']}"
+        )
+
+    def _cmd_reset(self):
+        # Force reset the session manager
+        self.bot.session.strategic_bias = "NEUTRAL"
+        self.bot.session.key_levels = {"support": 0.0, "resistance": 0.0}
+        self.bot.notifier.send("🔄 **Session Bias RESET**\nBot will re-evaluate macro trend on next cycle.")
+
+    def _cmd_positions(self):
+        # Broker snapshot is already shared with the trading loop and dropped after every order
+        trades = self.bot.broker.get_open_positions(max_age=1.0)
+        if not trades:
+            self.bot.notifier.send("🚫 No Open Trades")
+        else:
+            msg = "💼 **Portfolio**\n"
+            total_pnl = 0.0
+            for t in trades:
+                icon = "🟢" if t.profit >= 0 else "🔴"
+                msg += f"{icon} {t.symbol} {t.volume}lot | ${t.profit:.2f}\n"
+                total_pnl += t.profit
+            msg += f"-------------------\nTotal PnL: ${total_pnl:.2f}"
             self.bot.notifier.send(msg)
 
-        elif text == "/alpha":
-            # On-Demand Alpha Calculation (Runs the Math Engine instantly)
-            self.bot.notifier.send("🧮 Calculating Live Alpha...")
-            
-            for symbol in settings.symbol_list:
-                data = self.bot.broker.get_multi_timeframe_data(symbol)
-                if not data:
-                    self.bot.notifier.send(f"⚠️ {symbol}: No Data")
-                    continue
-                
-                # Run the Alpha Model
-                state = self.bot.alpha.get_market_state(data)
-                
-                # Format the output
-                score = state['final_alpha_score']
-                bd = state['m5_metrics']['breakdown']
-                
-                msg = (
-                    f" **{symbol} Alpha Scan**\n"
-                    f"Score: **{score}/1.0** ({state['status']})\n"
-                    f"-------------------\n"
-                    f" Structure: {bd['structure']} ({bd['structure_type']})\n"
-                    f"↩ Reversion: {bd['reversion']}\n"
-                    f" Volatility: {bd['volatility']}\n"
-                    f" Momentum: {bd['momentum']}"
-                )
-                self.bot.notifier.send(msg)
-
-        elif text == "/reset":
-            # Force reset the session manager
-            self.bot.session.strategic_bias = "NEUTRAL"
-            self.bot.session.key_levels = {"support": 0.0, "resistance": 0.0}
-            self.bot.notifier.send("🔄 **Session Bias RESET**\nBot will re-evaluate macro trend on next cycle.")
-
-        elif text == "/positions":
-            trades = self.bot.broker.get_open_positions()
-            if not trades:
-                self.bot.notifier.send("🚫 No Open Trades")
-            else:
-                msg = "💼 **Portfolio**\n"
-                total_pnl = 0.0
-                for t in trades:
-                    icon = "🟢" if t.profit >= 0 else "🔴"
-                    msg += f"{icon} {t.symbol} {t.volume}lot | ${t.profit:.2f}\n"
-                    total_pnl += t.profit
-                msg += f"-------------------\nTotal PnL: ${total_pnl:.2f}"
-                self.bot.notifier.send(msg)
-
-        elif text == "/balance":
-            info = self.bot.broker.get_account_info()
-            self.bot.notifier.send(f"💰 **Account**\nEquity: ${info.get('equity', 0):.2f}\nBalance: ${info.get('balance', 0):.2f}")
-
-        elif text == "/logs":
-            logs = self.bot.get_recent_logs(n=8)
-            self.bot.notifier.send(f" **System Logs**\n```\n{logs}\n```")
-
-        elif text == "/test":
-            self.bot.notifier.send(" Testing Broker Connection...")
-            sym = settings.symbol_list[0]
-            if self.bot.broker.verify_execution_capability(sym):
-                self.bot.notifier.send("✅ Broker OK\n✅ Trading Permissions OK")
-            else:
-                self.bot.notifier.send("❌ Broker Connection FAILED")
-
-        elif text == "/pause":
-            self.bot.paused = True
-            self.bot.notifier.send("**System PAUSED**")
-
-        elif text == "/resume":
-            self.bot.paused = False
-            self.bot.notifier.send("**System RESUMED**")
\ No newline at end of file
+    def _cmd_balance(self):
+        info = self._cached("balance", 1.5, self.bot.broker.get_account_info)
+        self.bot.notifier.send(f"💰 **Account**\nEquity: ${info.get('equity', 0):.2f}\nBalance: ${info.get('balance', 0):.2f}")
+
+    def _cmd_logs(self):
+        logs = self.bot.get_recent_logs(n=8)
+        self.bot.notifier.send(f" **System Logs**\n```\n{logs}\n```")
+
+    def _cmd_test(self):
+        self.bot.notifier.send(" Testing Broker Connection...")
+        sym = settings.symbol_list[0]
+        if self.bot.broker.verify_execution_capability(sym):
+            self.bot.notifier.send("✅ Broker OK\n✅ Trading Permissions OK")
+        else:
+            self.bot.notifier.send("❌ Broker Connection FAILED")
+
+    def _cmd_pause(self):
+        self.bot.paused = True
+        self.bot.notifier.send("**System PAUSED**")
+
+    def _cmd_resume(self):
+        self.bot.paused = False
+        self.bot.notifier.send("**System RESUMED**")
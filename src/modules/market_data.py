@@ -1,9 +1,25 @@
-import pandas as pd
-import pandas_ta as ta
+import math
+import threading
+from collections import deque
+from datetime import datetime
+from typing import NamedTuple
 import numpy as np
+from src.modules import indicators
 
 # --- FEATURE EXTRACTORS ---
 
+# LiquidityScore side codes
+STRUCTURE_TYPES = ("RESISTANCE_HIGH", "SUPPORT_LOW")
+
+def _clip01(x):
+    # Scalar np.clip(x, 0, 1); NaN passes through (max/min keep their first arg on NaN)
+    return min(max(x, 0.0), 1.0)
+
+def _round2(x):
+    # 2-decimal rounding of a non-negative score through integer scaling, cheaper than
+    # float.__round__'s decimal conversion; NaN (warm-up) passes through
+    return math.floor(x * 100.0 + 0.5) / 100.0 if x == x else x
+
 class LiquidityScore:
     """
     Calculates proximity to structural levels (Swing Highs/Lows).
@@ -14,27 +30,13 @@ class LiquidityScore:
         self.lookback = lookback
         self.threshold = proximity_threshold # In ATR units
 
-    def calculate(self, df, atr_series):
-        # 1. Identify Structural Points (Rolling Max/Min)
-        recent_low = df['low'].shift(1).rolling(self.lookback).min()
-        recent_high = df['high'].shift(1).rolling(self.lookback).max()
-        
-        # 2. Calculate Distances (in ATR units)
-        # Low: Negative distance = Sweep. Positive = Above.
-        dist_low = (df['low'] - recent_low) / atr_series
-        # High: Negative distance = Sweep (Price > High). Positive = Below.
-        dist_high = (recent_high - df['high']) / atr_series
-        
-        # 3. Score Calculation (0.0 to 1.0)
-        # We take the MAX score of either High or Low structure proximity
-        score_low = np.where(dist_low <= 0, 1.0, 
-                    np.where(dist_low <= self.threshold, 1.0 - (dist_low / self.threshold), 0.0))
-                    
-        score_high = np.where(dist_high <= 0, 1.0,
-                     np.where(dist_high <= self.threshold, 1.0 - (dist_high / self.threshold), 0.0))
-        
-        # Return the max intensity and the type of structure interacting
-        return np.maximum(score_low, score_high), np.where(score_low > score_high, "SUPPORT_LOW", "RESISTANCE_HIGH")
+    def score_last(self, low_last, high_last, recent_low, recent_high, atr_last):
+        """Score and side code of a single bar against the given previous-`lookback` extremes."""
+        d_low = (low_last - recent_low) / atr_last
+        d_high = (recent_high - high_last) / atr_last
+        s_low = 1.0 if d_low <= 0 else (1.0 - d_low / self.threshold if d_low <= self.threshold else 0.0)
+        s_high = 1.0 if d_high <= 0 else (1.0 - d_high / self.threshold if d_high <= self.threshold else 0.0)
+        return (s_low, 1) if s_low > s_high else (s_high, 0)
 
 class FairValueScore:
     """
@@ -44,15 +46,8 @@ class FairValueScore:
     def __init__(self, ema_period=50):
         self.ema_period = ema_period
 
-    def calculate(self, close_series, atr_series):
-        fair_value = ta.ema(close_series, length=self.ema_period)
-        if fair_value is None: return np.zeros_like(close_series)
-        
-        # Z-Score: Distance from Mean in ATRs
-        z_raw = (close_series - fair_value) / atr_series
-        
-        # Normalize: Cap extreme at 2.5 ATRs = 1.0 Score
-        return np.clip(abs(z_raw) / 2.5, 0.0, 1.0)
+    def score_last(self, close_last, ema_last, atr_last):
+        return _clip01(abs(close_last - ema_last) / atr_last / 2.5)
 
 class VolatilityScore:
     """
@@ -63,12 +58,8 @@ class VolatilityScore:
     def __init__(self, avg_period=50):
         self.period = avg_period
         
-    def calculate(self, atr_series):
-        atr_avg = atr_series.rolling(self.period).mean()
-        # Ratio: Current / Average
-        ratio = atr_series / atr_avg
-        # Cap at 1.0 (We just want to know if it's "Active Enough")
-        return np.clip(ratio, 0.0, 1.0)
+    def score_last(self, atr_last, atr_avg):
+        return _clip01(atr_last / atr_avg)
 
 class MomentumScore:
     """
@@ -79,24 +70,8 @@ class MomentumScore:
         self.fast = fast
         self.slow = slow
 
-    def calculate(self, close_series):
-        fast_ema = ta.ema(close_series, length=self.fast)
-        slow_ema = ta.ema(close_series, length=self.slow)
-        
-        if fast_ema is None or slow_ema is None: return np.zeros_like(close_series)
-        
-        # 1. Binary Crossover (0 or 1)
-        # We assume Momentum is absolute intensity. 
-        # For Alpha calculation, we want "Is there momentum?", Direction is handled by Trend Logic.
-        # Here we calculate 'Alignment Strength'
-        
-        # Gap Strength (Normalized)
-        gap = abs(fast_ema - slow_ema) / close_series
-        strength = np.clip(gap * 1000, 0, 1.0) # Scale factor for forex
-        
-        # Base Score (Is Fast separated from Slow?)
-        # We treat crossover as a state, strength as magnitude
-        return strength # Simplified to just strength of trend for Alpha Summation
+    def score_last(self, close_last, fast_last, slow_last):
+        return _clip01(abs(fast_last - slow_last) / close_last * 1000)
 
 class AlphaStack:
     """
@@ -119,8 +94,106 @@ class AlphaStack:
         )
         return np.clip(alpha, 0.0, 1.0)
 
+# --- INDICATOR STATE ---
+
+def _true_range(high, low, prev_close):
+    # Each input read once; same expression as the ATR kernels
+    return max(abs(high - low), abs(high - prev_close), abs(prev_close - low))
+
+class IndicatorCache:
+    """
+    Incremental EMA/ATR per (symbol, timeframe).
+    State is kept at the last CLOSED bar, as scalars plus the few closed ATRs the volatility
+    average needs: newly closed bars are folded in with the EMA / Wilder recurrences (O(1) each)
+    and the forming bar is derived from it in O(1).
+    A full recompute (JIT kernels) only happens on first sight or when the window no longer overlaps.
+    Every consumer of an unchanged bar (scan loop, /alpha) gets the same snapshot back.
+    """
+    def __init__(self, ema_periods, atr_period=14, avg_period=50):
+        self.ema_periods = tuple(ema_periods)
+        self.atr_period = atr_period
+        self.avg_period = avg_period
+        # Recurrence constants, fixed per instance: EMA alpha 2/(p+1) per period, Wilder decay (n-1)/n
+        self._ema_alpha = tuple((p, 2.0 / (p + 1)) for p in self.ema_periods)
+        self._decay = 1.0 - 1.0 / atr_period
+        self._state = {}
+        self._locks = {} # per key: symbols warm up / fold concurrently on the scan threads
+
+    def get(self, key, t, h, l, c):
+        """
+        Forming-bar values {"atr", "atr_avg" (mean of the last avg_period ATRs), "ema": {period: value}}
+        from time/high/low/close arrays, or None if the window is too short.
+        """
+        if len(c) < 2: return None
+
+        with self._locks.setdefault(key, threading.Lock()):
+            st = self._state.get(key) if key is not None else None
+            if st is not None: st = self._fold(st, t, h, l, c)
+            if st is None: st = self._warm_up(t, h, l, c)
+            if st is None: return None
+            if key is not None: self._state[key] = st
+
+        # Same forming bar as the last caller saw -> hand out the same snapshot
+        i = len(c) - 1
+        sig = (t[i], h[i], l[i], c[i])
+        view = st.get('view')
+        if view is not None and view[0] == sig: return view[1]
+
+        # Forming bar: one step on top of the closed-bar state
+        tr = _true_range(h[i], l[i], c[i - 1])
+        d = self._decay
+        atr_now = (tr + d * st['atr_num']) / (1.0 + d * st['atr_den']) if st['atr_count'] + 1 >= self.atr_period else np.nan
+        closed = st['atr_window'] # the avg_period - 1 newest closed ATRs
+        out = {
+            "atr": atr_now,
+            "atr_avg": (sum(closed) + atr_now) / self.avg_period if len(closed) == closed.maxlen else np.nan,
+            "ema": {p: st['ema'][p] + a * (c[i] - st['ema'][p]) for p, a in self._ema_alpha}
+        }
+        st['view'] = (sig, out)
+        return out
+
+    def _warm_up(self, t, h, l, c):
+        n = len(c) - 1 # closed bars only
+        if n < max(self.ema_periods): return None
+        # Only the EMA values are carried, never their series
+        ema = {p: indicators.ema_last(c[:n], p) for p in self.ema_periods}
+        atr_window, num, den = indicators.atr_tail(h[:n], l[:n], c[:n], self.atr_period, self.avg_period - 1)
+        return {
+            "time": t[n - 1], "ema": ema, "atr_num": num, "atr_den": den, "atr_count": n - 1,
+            "atr_window": deque(atr_window.tolist(), maxlen=self.avg_period - 1)
+        }
+
+    def _fold(self, st, t, h, l, c):
+        n = len(c) - 1
+        if t[n - 1] == st['time']: return st # No new closed bar, only the forming one moved
+        j = int(np.searchsorted(t, st['time']))
+        # Cached bar must still be in the closed part of the window
+        if j >= n or t[j] != st['time']: return None
+
+        d = self._decay
+        num, den, count = st['atr_num'], st['atr_den'], st['atr_count']
+        ema = dict(st['ema'])
+        window = deque(st['atr_window'], maxlen=self.avg_period - 1) # copy: readers may hold the old state
+        for i in range(j + 1, n):
+            tr = _true_range(h[i], l[i], c[i - 1])
+            num, den, count = tr + d * num, 1.0 + d * den, count + 1
+            window.append(num / den if count >= self.atr_period else np.nan)
+            for p, a in self._ema_alpha:
+                ema[p] += a * (c[i] - ema[p])
+
+        return {"time": t[n - 1], "ema": ema, "atr_num": num, "atr_den": den, "atr_count": count, "atr_window": window}
+
 # --- MAIN MODEL ---
 
+PRICE_FIELDS = ('high', 'low', 'close')
+
+class LastBar(NamedTuple):
+    """The forming bar as plain floats, read once per timeframe."""
+    high: float
+    low: float
+    close: float
+ALPHA_STATUS = ("WAIT", "REVIEW_REQUIRED", "HIGH_CONVICTION") # alpha <= 0.60, > 0.60, > 0.85
+
 class AlphaModel:
     def __init__(self):
         self.liq = LiquidityScore()
@@ -128,59 +201,83 @@ class AlphaModel:
         self.vol = VolatilityScore()
         self.mom = MomentumScore()
         self.stack = AlphaStack()
+        self.ind = IndicatorCache((self.mom.fast, self.mom.slow, self.fv.ema_period), avg_period=self.vol.period)
+        self._state_cache = {} # symbol -> (last-bar signature, packet)
 
-    def _process_tf(self, candles):
-        df = pd.DataFrame(candles)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
+    def _process_tf(self, candles, key=None):
+        high, low, close = (np.asarray(candles[f], dtype=np.float64) for f in PRICE_FIELDS)
+        bar = LastBar(float(high[-1]), float(low[-1]), float(close[-1]))
         
-        # Base Indicators
-        atr = ta.atr(df['high'], df['low'], df['close'], length=14)
-        df['atr'] = atr
+        # Base Indicators at the last bar (incremental per symbol/TF; pandas_ta ATR / EMA conventions)
+        ind = self.ind.get(key, candles['time'], high, low, close)
+        if ind is not None:
+            atr, atr_avg, ema = ind['atr'], ind['atr_avg'], ind['ema']
+        else:
+            # Window shorter than the longest EMA: whatever the window can seed is computed directly
+            # (momentum pair from `slow` bars up, fair value from its period); the rest sit at the
+            # close -> neutral reversion / momentum
+            atr_win = indicators.atr_tail(high, low, close, 14, self.vol.period)[0]
+            atr = atr_win[-1]
+            atr_avg = atr_win.mean() if len(atr_win) == self.vol.period else np.nan
+            ema = dict.fromkeys((self.fv.ema_period, self.mom.fast, self.mom.slow), bar.close)
+            if len(close) >= self.mom.slow:
+                ema[self.mom.fast] = indicators.ema_last(close, self.mom.fast)
+                ema[self.mom.slow] = indicators.ema_last(close, self.mom.slow)
+            if len(close) >= self.fv.ema_period:
+                ema[self.fv.ema_period] = indicators.ema_last(close, self.fv.ema_period)
         
-        # Feature Engineering
-        s_score, s_type = self.liq.calculate(df, atr)
-        r_score = self.fv.calculate(df['close'], atr)
-        v_score = self.vol.calculate(atr)
-        m_score = self.mom.calculate(df['close'])
+        # Structure levels: extremes of the `lookback` bars before this one
+        lb = self.liq.lookback
+        if len(close) > lb:
+            recent_low, recent_high = low[-lb - 1:-1].min(), high[-lb - 1:-1].max()
+        else:
+            recent_low = recent_high = np.nan
         
-        # Get Latest Values
-        last_s = s_score[-1] if isinstance(s_score, np.ndarray) else s_score.iloc[-1]
-        last_r = r_score.iloc[-1]
-        last_v = v_score.iloc[-1]
-        last_m = m_score.iloc[-1]
-        struct_type = s_type[-1] if isinstance(s_type, np.ndarray) else s_type.iloc[-1]
+        # Feature Engineering: scalars only, nothing full-length is built
+        last_s, code = self.liq.score_last(bar.low, bar.high, recent_low, recent_high, atr)
+        last_r = self.fv.score_last(bar.close, ema[self.fv.ema_period], atr)
+        last_v = self.vol.score_last(atr, atr_avg)
+        last_m = self.mom.score_last(bar.close, ema[self.mom.fast], ema[self.mom.slow])
         
         # Calculate Final Alpha
         total_alpha = self.stack.get_total_alpha(last_s, last_r, last_v, last_m)
         
         return {
-            "alpha": round(float(total_alpha), 2),
+            "alpha": _round2(float(total_alpha)),
             "breakdown": {
-                "structure": round(float(last_s), 2),
-                "reversion": round(float(last_r), 2),
-                "volatility": round(float(last_v), 2),
-                "momentum": round(float(last_m), 2),
-                "structure_type": struct_type
+                "structure": _round2(last_s),
+                "reversion": _round2(last_r),
+                "volatility": _round2(last_v),
+                "momentum": _round2(last_m),
+                "structure_type": STRUCTURE_TYPES[code]
             },
-            "close": float(df['close'].iloc[-1]),
-            "atr": float(atr.iloc[-1])
+            "close": bar.close,
+            "atr": float(atr)
         }
 
-    def get_market_state(self, data_bundle):
-        # We focus on M5 for Execution Alpha, H1/H4 for Context
-        m5_alpha = self._process_tf(data_bundle['M5'])
-        h1_alpha = self._process_tf(data_bundle['H1'])
+    def get_market_state(self, data_bundle, symbol=None):
+        # Closed bars never change, so identical last bars on both TFs mean an identical packet
+        if symbol:
+            sig = tuple((c['time'][-1], c['high'][-1], c['low'][-1], c['close'][-1]) for c in (data_bundle['M5'], data_bundle['H1']))
+            hit = self._state_cache.get(symbol)
+            if hit is not None and hit[0] == sig: return hit[1]
+
+        # We focus on M5 for Execution Alpha, H1 for Context
+        # Indicator state is only carried across calls when we know whose candles these are
+        m5_alpha = self._process_tf(data_bundle['M5'], (symbol, 'M5') if symbol else None)
+        h1_alpha = self._process_tf(data_bundle['H1'], (symbol, 'H1') if symbol else None)
         
-        # Determine Status Tag
-        status = "WAIT"
-        if m5_alpha['alpha'] > 0.60: status = "REVIEW_REQUIRED"
-        if m5_alpha['alpha'] > 0.85: status = "HIGH_CONVICTION"
+        # Determine Status Tag: number of thresholds cleared indexes the tag
+        a = m5_alpha['alpha']
+        status = ALPHA_STATUS[(a > 0.60) + (a > 0.85)]
 
-        return {
+        packet = {
             "packet_type": "PROBABILISTIC_ALPHA",
-            "timestamp": pd.Timestamp.now().isoformat(),
+            "timestamp": datetime.now().isoformat(),
             "final_alpha_score": m5_alpha['alpha'],
             "status": status,
             "m5_metrics": m5_alpha,
             "h1_context": h1_alpha
-        }
\ No newline at end of file
+        }
+        if symbol: self._state_cache[symbol] = (sig, packet)
+        return packet
\ No newline at end of file
@@ -1,50 +1,112 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
+import queue
+import threading
 import time
 from src.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+def make_http_session() -> requests.Session:
+    """Keep-alive session with pooled connections and transport-level retry on 429/5xx."""
+    session = requests.Session()
+    retry = Retry(
+        total=3, read=0, backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retry))
+    return session
+
+# One pool to api.telegram.org for the whole process (sender worker + command long-poll)
+TG_SESSION = make_http_session()
+
 class TelegramNotifier:
-    def __init__(self):
+    HEADER_PREFIX = "🤖 *QuantBot*\n\n" # Markdown header on every message
+    __slots__ = ('token', 'chat_id', 'enabled', 'session', 'max_chars', '_q', 'url', '_base_payload')
+
+    def __init__(self, session=None):
         self.token = settings.TELEGRAM_BOT_TOKEN.get_secret_value()
         self.chat_id = settings.TELEGRAM_CHAT_ID
         self.enabled = bool(self.token and self.chat_id)
-        self.session = requests.Session()
+        self.session = session or TG_SESSION
+        # Fixed per bot: endpoint and the payload fields every message shares
+        self.url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+        self._base_payload = {"chat_id": self.chat_id, "parse_mode": "Markdown"}
+
+        # Background Sender: callers only enqueue, the worker does the HTTPS round-trip
+        self.max_chars = 4000 # Telegram hard limit is 4096
+        self._q = queue.Queue(maxsize=1000) # bounded: a long outage must not grow memory without limit
+        if self.enabled:
+            threading.Thread(target=self._drain, daemon=True).start()
 
-    def send(self, message: str, retries=3):
+    def send(self, message: str):
         if not self.enabled:
             return
-        
-        url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+        try:
+            self._q.put_nowait(message)
+        except queue.Full:
+            logger.warning("Telegram queue full, dropping message.")
+
+    def flush(self, timeout=10):
+        """Blocks until queued messages are delivered (or timeout). Used on shutdown."""
+        deadline = time.monotonic() + timeout
+        while self._q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def _drain(self):
+        pending = None
+        while True:
+            batch = [pending if pending is not None else self._q.get()]
+            pending = None
+            size = len(batch[0])
+            
+            # Coalesce whatever else is already waiting into one sendMessage
+            while True:
+                try:
+                    nxt = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if size + len(nxt) + 5 > self.max_chars:
+                    pending = nxt
+                    break
+                batch.append(nxt)
+                size += len(nxt) + 5
+            
+            try:
+                self._post("\n---\n".join(batch))
+            except Exception as e:
+                logger.error(f"Telegram Worker Error: {e}")
+            finally:
+                for _ in batch:
+                    self._q.task_done()
+
+    def _post(self, message: str):
+        # Retries (connect errors, 429 incl. Retry-After, 5xx) with exponential backoff live in the
+        # session's adapter; read timeouts are not retried there, so a slow POST isn't sent twice
+        url = self.url
         
         # Try sending with Markdown first
-        payload = {
-            "chat_id": self.chat_id,
-            "text": f"🤖 *QuantBot*\n\n{message}",
-            "parse_mode": "Markdown"
-        }
+        payload = {**self._base_payload, "text": self.HEADER_PREFIX + message}
         
-        for attempt in range(retries):
-            try:
-                response = self.session.post(url, json=payload, timeout=10)
-                
-                if response.status_code == 200:
-                    return # Success!
-                
-                # If Bad Request (400) - likely Markdown syntax error
-                elif response.status_code == 400:
-                    logger.warning(f"Telegram Markdown Error: {response.text}. Retrying as Plain Text.")
-                    # Retry immediately as Plain Text
-                    payload.pop("parse_mode") # Remove Markdown mode
-                    self.session.post(url, json=payload, timeout=10)
-                    return
-
-                else:
-                    logger.warning(f"Telegram Error {response.status_code}: {response.text}")
+        try:
+            response = self.session.post(url, json=payload, timeout=10)
+            
+            if response.status_code == 200:
+                return # Success!
             
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Telegram Timeout (Attempt {attempt+1}/{retries}): {e}")
-                time.sleep(2)
+            # If Bad Request (400) - likely Markdown syntax error
+            elif response.status_code == 400:
+                logger.warning(f"Telegram Markdown Error: {response.text}. Retrying as Plain Text.")
+                # Retry immediately as Plain Text
+                payload.pop("parse_mode") # Remove Markdown mode
+                self.session.post(url, json=payload, timeout=10)
+                return
+
+            logger.error(f"Telegram Error {response.status_code}: {response.text}")
         
-        logger.error("Failed to send Telegram message after retries.")
\ No newline at end of file
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to send Telegram message: {e}")
@@ -1,18 +1,25 @@
 import time
-from datetime import datetime, timezone
+from src.config.settings import settings
 
 class SessionManager:
+    __slots__ = ('current_session', 'strategic_bias', 'key_levels', 'last_strategy_update', 'open_hour', 'close_hour', 'next_transition_ts')
+
     def __init__(self):
         self.current_session = "CLOSED"
         self.strategic_bias = "NEUTRAL" # The "Anchor"
         self.key_levels = {"support": 0.0, "resistance": 0.0}
         self.last_strategy_update = 0
+        self.open_hour, self.close_hour = settings.TRADING_HOURS_UTC
+        self.next_transition_ts = 0.0 # Epoch secs of next OPEN/CLOSED flip; 0 forces a first check
         
     def update_session_status(self):
         """Determines if we are in London/NY active hours."""
-        hour = datetime.now(timezone.utc).hour
-        # 07:00 UTC (London Pre-market) to 21:00 UTC (NY Afternoon)
-        if 7 <= hour < 21:
+        # UTC straight from the epoch: no tz-aware datetime needed for an hour-of-day check
+        now = time.time()
+        hour = int(now // 3600 % 24)
+        self.next_transition_ts = self._next_transition(now, hour)
+        # TRADING_HOURS_UTC, 07:00-21:00 by default (London pre-market to NY afternoon)
+        if self.open_hour <= hour < self.close_hour:
             if self.current_session == "CLOSED":
                 # Session just started -> Reset Bias to force a fresh Strategic Analysis
                 self.strategic_bias = "NEUTRAL" 
@@ -21,6 +28,15 @@ class SessionManager:
             self.current_session = "CLOSED"
             self.strategic_bias = "NEUTRAL"
 
+    def _next_transition(self, now, hour):
+        """Next session open/close boundary after epoch `now` (UTC hour `hour`), as an epoch timestamp."""
+        midnight = now - now % 86400
+        if hour < self.open_hour:
+            return midnight + self.open_hour * 3600
+        if hour < self.close_hour:
+            return midnight + self.close_hour * 3600
+        return midnight + 86400 + self.open_hour * 3600
+
     def update_strategic_view(self, daily_trend, h4_trend, key_structure):
         """
         Updates the 'Strategist' view. 
@@ -0,0 +1,35 @@
+"""
+Lets the bot modules import without a MetaTrader5 terminal, the Gemini SDK or a .env:
+empty stand-in modules are registered only when the real package is missing, and tests
+patch in the calls they exercise. Import this before anything under src.
+"""
+import os
+import sys
+import types
+
+for var, value in (("GEMINI_API_KEY", "test"), ("MT5_LOGIN", "1"), ("MT5_PASSWORD", "test"), ("MT5_SERVER", "test")):
+    os.environ.setdefault(var, value)
+
+def _stub(name, **attrs):
+    try:
+        __import__(name)
+        return sys.modules[name]
+    except ImportError:
+        mod = sys.modules[name] = types.ModuleType(name)
+        mod.__dict__.update(attrs)
+        parent, _, child = name.rpartition(".")
+        if parent: setattr(sys.modules[parent], child, mod)
+        return mod
+
+class _ResourceExhausted(Exception):
+    pass
+
+class _GenerativeModel:
+    def __init__(self, **kwargs): pass
+    def generate_content(self, prompt, **kwargs): raise RuntimeError("no model in tests")
+
+_stub("MetaTrader5", ORDER_TYPE_BUY=0, ORDER_TYPE_SELL=1, DEAL_ENTRY_IN=0, DEAL_ENTRY_OUT=1, TRADE_RETCODE_DONE=10009)
+_stub("google")
+_stub("google.api_core")
+_stub("google.api_core.exceptions", ResourceExhausted=_ResourceExhausted)
+_stub("google.generativeai", configure=lambda **kwargs: None, GenerativeModel=_GenerativeModel)
@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+from src.modules.market_data import AlphaModel
+from tests.test_indicator_cache import make_bars
+
+def ema_ref(c, p):
+    e, a = c[:p].mean(), 2.0 / (p + 1)
+    for x in c[p:]: e += a * (x - e)
+    return e
+
+def candles(n, seed=7):
+    t, h, l, c = make_bars(n, seed)
+    # Steady drift so the 9/21 EMAs separate
+    drift = 0.0005 * np.arange(n)
+    return {"time": t, "high": h + drift, "low": l + drift, "close": c + drift}
+
+class ShortWindowTest(unittest.TestCase):
+    def test_momentum_from_21_bars(self):
+        model = AlphaModel()
+        for n in (21, 35, 50):
+            bars = candles(n)
+            close = bars["close"]
+            out = model._process_tf(bars)
+            want = min(abs(ema_ref(close, 9) - ema_ref(close, 21)) / close[-1] * 1000, 1.0)
+            self.assertGreater(out["breakdown"]["momentum"], 0.0)
+            self.assertAlmostEqual(out["breakdown"]["momentum"], round(want, 2), places=9)
+
+    def test_no_momentum_below_21_bars(self):
+        self.assertEqual(AlphaModel()._process_tf(candles(20))["breakdown"]["momentum"], 0.0)
+
+    def test_reversion_neutral_until_fair_value_seeds(self):
+        self.assertEqual(AlphaModel()._process_tf(candles(49))["breakdown"]["reversion"], 0.0)
+        self.assertGreater(AlphaModel()._process_tf(candles(50))["breakdown"]["reversion"], 0.0)
+
+    def test_fallback_meets_cached_path(self):
+        # At 51 bars the incremental cache takes over; the same EMA convention on both sides
+        bars = candles(51)
+        cached = AlphaModel()._process_tf(bars, ("EURUSD", "M5"))
+        close = bars["close"]
+        want = min(abs(ema_ref(close, 9) - ema_ref(close, 21)) / close[-1] * 1000, 1.0)
+        self.assertAlmostEqual(cached["breakdown"]["momentum"], round(want, 2), places=9)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+from tests import support # noqa: F401  (stand-ins for the Gemini SDK / .env)
+from src.modules import brain
+from src.modules.brain import GeminiBrain
+
+def packet(structure=1.0):
+    return {
+        "final_alpha_score": 0.7, "status": "REVIEW_REQUIRED",
+        "m5_metrics": {"breakdown": {"structure": structure, "reversion": 0.3, "volatility": 1.0, "momentum": 0.0, "structure_type": "SUPPORT_LOW"}}
+    }
+
+class FakeModel:
+    """Answers every prompt with `decisions` (symbol -> decision) and records the prompts."""
+    def __init__(self, decisions):
+        self.decisions = decisions
+        self.prompts = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return mock.Mock(text=json.dumps({"decisions": self.decisions}))
+
+HOLD = {"action": "HOLD", "reasoning": "flat"}
+BUY = {"action": "BUY", "risk_percentage": 0.5, "stop_loss": 1.0, "take_profit": 2.0, "reasoning": "sweep"}
+ACCOUNT = {"balance": 10000.0, "open_trades_details": {}}
+
+class BrainTestCase(unittest.TestCase):
+    def make_brain(self, decisions):
+        b = GeminiBrain()
+        b.model = FakeModel(decisions)
+        return b
+
+class DecisionMemoTest(BrainTestCase):
+    def test_hold_is_reused(self):
+        b = self.make_brain({"EURUSD": HOLD})
+        first = b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        second = b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        self.assertEqual(len(b.model.prompts), 1)
+        self.assertEqual(first, second)
+
+    def test_hold_expires_after_ttl(self):
+        b = self.make_brain({"EURUSD": HOLD})
+        b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        later = brain.time.monotonic() + b.cache_ttl + 1
+        with mock.patch.object(brain.time, "monotonic", return_value=later):
+            b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        self.assertEqual(len(b.model.prompts), 2)
+
+    def test_changed_inputs_miss(self):
+        b = self.make_brain({"EURUSD": HOLD})
+        b.analyze_market_batch({"EURUSD": packet(1.0)}, ACCOUNT)
+        b.analyze_market_batch({"EURUSD": packet(0.5)}, ACCOUNT)
+        b.analyze_market_batch({"EURUSD": packet(0.5)}, {"open_trades_details": {"EURUSD": [{"ticket": 7}]}})
+        self.assertEqual(len(b.model.prompts), 3)
+
+    def test_orders_are_never_replayed(self):
+        # BUY/SELL carry absolute SL/TP: always asked fresh
+        b = self.make_brain({"EURUSD": BUY})
+        b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        self.assertEqual(len(b.model.prompts), 2)
+
+    def test_errors_are_not_cached(self):
+        b = self.make_brain({})
+        b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        self.assertEqual(len(b.model.prompts), 2)
+
+class QuotaBackoffTest(BrainTestCase):
+    def test_retries_after_quota_error(self):
+        b = self.make_brain({"EURUSD": BUY})
+        answer = b.model.generate_content
+        b.model.generate_content = mock.Mock(side_effect=[brain.ResourceExhausted("429"), answer("retry")])
+        with mock.patch.object(b._stop, "wait", return_value=False) as wait:
+            out = b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        self.assertEqual(out["EURUSD"], BUY)
+        self.assertEqual(wait.call_count, 1)
+
+    def test_shutdown_cuts_backoff_short(self):
+        stop = threading.Event()
+        stop.set()
+        b = GeminiBrain(stop_event=stop)
+        b.model = mock.Mock()
+        b.model.generate_content.side_effect = brain.ResourceExhausted("429")
+        started = time.monotonic()
+        out = b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(b.model.generate_content.call_count, 1)
+        self.assertEqual(out["EURUSD"], {"action": "HOLD", "reasoning": "AI Error"})
+
+class BatchAnalysisTest(BrainTestCase):
+    def test_one_call_for_all_symbols(self):
+        b = self.make_brain({"EURUSD": HOLD, "GBPUSD": BUY})
+        out = b.analyze_market_batch({"EURUSD": packet(), "GBPUSD": packet(0.5)}, ACCOUNT)
+        self.assertEqual(len(b.model.prompts), 1)
+        self.assertIn("--- EURUSD ALPHA DATA PACKET", b.model.prompts[0])
+        self.assertIn("--- GBPUSD ALPHA DATA PACKET", b.model.prompts[0])
+        self.assertEqual(out, {"EURUSD": HOLD, "GBPUSD": BUY})
+
+    def test_symbol_missing_from_answer_falls_back_to_hold(self):
+        b = self.make_brain({"EURUSD": BUY})
+        out = b.analyze_market_batch({"EURUSD": packet(), "GBPUSD": packet()}, ACCOUNT)
+        self.assertEqual(out["EURUSD"], BUY)
+        self.assertEqual(out["GBPUSD"], {"action": "HOLD", "reasoning": "AI Error"})
+
+    def test_failed_call_holds_every_symbol(self):
+        b = self.make_brain({})
+        b.model.generate_content = mock.Mock(side_effect=RuntimeError("boom"))
+        out = b.analyze_market_batch({"EURUSD": packet(), "GBPUSD": packet()}, ACCOUNT)
+        self.assertEqual(set(out), {"EURUSD", "GBPUSD"})
+        self.assertTrue(all(d == {"action": "HOLD", "reasoning": "AI Error"} for d in out.values()))
+
+    def test_malformed_answer_holds_every_symbol(self):
+        b = self.make_brain({})
+        b.model.generate_content = mock.Mock(return_value=mock.Mock(text="not json"))
+        out = b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        self.assertEqual(out["EURUSD"]["reasoning"], "AI Error")
+
+    def test_only_uncached_symbols_are_sent(self):
+        b = self.make_brain({"EURUSD": HOLD})
+        b.analyze_market_batch({"EURUSD": packet()}, ACCOUNT)
+        b.model.decisions = {"GBPUSD": BUY}
+        out = b.analyze_market_batch({"EURUSD": packet(), "GBPUSD": packet()}, ACCOUNT)
+        self.assertEqual(len(b.model.prompts), 2)
+        self.assertNotIn("--- EURUSD ALPHA DATA PACKET", b.model.prompts[1])
+        self.assertEqual(out, {"EURUSD": HOLD, "GBPUSD": BUY})
+
+if __name__ == "__main__":
+    unittest.main()
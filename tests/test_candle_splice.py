@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+import numpy as np
+from tests import support # noqa: F401  (stand-ins for MetaTrader5 / .env)
+from src.modules import broker
+from src.modules.broker import MT5Broker, CANDLE_FIELDS, BARS_PER_TF, TAIL_BARS
+
+RATES_DTYPE = np.dtype([("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+                        ("tick_volume", "<u8"), ("spread", "<i4"), ("real_volume", "<u8")])
+
+class FakeTerminal:
+    """Serves the newest `count` bars of a growing history, like copy_rates_from_pos(symbol, tf, 0, count)."""
+    def __init__(self, n=2000, seed=3):
+        rng = np.random.default_rng(seed)
+        self.rates = np.zeros(n, dtype=RATES_DTYPE)
+        close = 1.25 + np.cumsum(rng.normal(0, 0.0004, n))
+        self.rates["time"] = 1_700_000_000 + 300 * np.arange(n)
+        self.rates["open"], self.rates["close"] = close - 0.0001, close
+        self.rates["high"], self.rates["low"] = close + 0.0003, close - 0.0003
+        self.rates["tick_volume"] = rng.integers(1, 500, n)
+        self.end = 500
+        self.requests = []
+
+    def copy_rates_from_pos(self, symbol, tf, start, count):
+        self.requests.append(count)
+        return self.rates[:self.end][-count:].copy()
+
+    def tick(self):
+        # Forming bar moves
+        self.rates["close"][self.end - 1] += 0.0001
+        self.rates["high"][self.end - 1] += 0.0001
+
+class CandleSpliceTest(unittest.TestCase):
+    def setUp(self):
+        self.term = FakeTerminal()
+        patcher = mock.patch.object(broker.mt5, "copy_rates_from_pos", self.term.copy_rates_from_pos, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broker = MT5Broker()
+
+    def pull(self):
+        return self.broker._get_rates("EURUSD", "M5", 5)
+
+    def assertFresh(self, cols):
+        want = self.term.rates[:self.term.end][-BARS_PER_TF["M5"]:]
+        for f in CANDLE_FIELDS:
+            np.testing.assert_array_equal(cols[f], want[f])
+            self.assertTrue(cols[f].flags.c_contiguous)
+        for f in ("open", "high", "low", "close"):
+            self.assertEqual(cols[f].dtype, np.float64)
+
+    def test_new_bars_are_spliced(self):
+        self.assertFresh(self.pull())
+        for step in (1, 2, TAIL_BARS - 1):
+            self.term.end += step
+            self.term.tick()
+            self.term.requests.clear()
+            self.assertFresh(self.pull())
+            # Probe + short tail, never the full history
+            self.assertEqual(self.term.requests, [1, TAIL_BARS])
+
+    def test_forming_bar_tick(self):
+        first = self.pull()
+        self.term.tick()
+        second = self.pull()
+        self.assertFresh(second)
+        self.assertIsNot(first["close"], second["close"])
+        # Unchanged terminal -> the very same arrays
+        self.assertIs(self.pull(), second)
+
+    def test_gap_pulls_full_history(self):
+        self.pull()
+        self.term.end += TAIL_BARS + 5
+        self.term.requests.clear()
+        self.assertFresh(self.pull())
+        self.assertEqual(self.term.requests, [1, TAIL_BARS, BARS_PER_TF["M5"]])
+
+    def test_old_arrays_are_not_mutated(self):
+        first = self.pull()
+        snapshot = {f: first[f].copy() for f in CANDLE_FIELDS}
+        self.term.end += 2
+        self.pull()
+        for f in CANDLE_FIELDS:
+            np.testing.assert_array_equal(first[f], snapshot[f])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import numpy as np
+from src.modules.market_data import IndicatorCache
+
+EMA_PERIODS = (9, 21, 50)
+WINDOW = 200
+
+def make_bars(n, seed=7):
+    """Random-walk M5 bars: (time, high, low, close) as float64 / int64 columns."""
+    rng = np.random.default_rng(seed)
+    close = 1.25 + np.cumsum(rng.normal(0, 0.0004, n))
+    high = close + rng.uniform(0, 0.0006, n)
+    low = close - rng.uniform(0, 0.0006, n)
+    t = 1_700_000_000 + 300 * np.arange(n, dtype=np.int64)
+    return t, high, low, close
+
+def reference(h, l, c, atr_period=14, avg_period=50):
+    """Straight full recompute at the last bar (pandas_ta EMA / Wilder ATR conventions)."""
+    ema = {}
+    for p in EMA_PERIODS:
+        e, a = c[:p].mean(), 2.0 / (p + 1)
+        for x in c[p:]: e += a * (x - e)
+        ema[p] = e
+    d = 1.0 - 1.0 / atr_period
+    num = den = 0.0
+    atrs = np.full(len(c), np.nan)
+    for i in range(1, len(c)):
+        tr = max(h[i] - l[i], abs(h[i] - c[i - 1]), abs(c[i - 1] - l[i]))
+        num, den = tr + d * num, 1.0 + d * den
+        if i >= atr_period: atrs[i] = num / den
+    return {"atr": atrs[-1], "atr_avg": atrs[-avg_period:].mean(), "ema": ema}
+
+class IndicatorCacheTest(unittest.TestCase):
+    def assertMatches(self, got, want):
+        np.testing.assert_allclose(got["atr"], want["atr"], rtol=1e-12)
+        np.testing.assert_allclose(got["atr_avg"], want["atr_avg"], rtol=1e-12)
+        for p in EMA_PERIODS:
+            np.testing.assert_allclose(got["ema"][p], want["ema"][p], rtol=1e-12)
+
+    def test_fold_matches_full_recompute(self):
+        # One cache fed sliding windows must equal a recompute over all history it has seen
+        t, h, l, c = make_bars(WINDOW + 500)
+        cache = IndicatorCache(EMA_PERIODS)
+        for end in range(WINDOW, WINDOW + 500):
+            s = slice(end - WINDOW, end)
+            got = cache.get("EURUSD", t[s], h[s], l[s], c[s])
+            self.assertMatches(got, reference(h[:end], l[:end], c[:end]))
+
+    def test_multi_bar_step(self):
+        t, h, l, c = make_bars(WINDOW + 40)
+        cache = IndicatorCache(EMA_PERIODS)
+        for end in (WINDOW, WINDOW + 3, WINDOW + 10, WINDOW + 40):
+            s = slice(end - WINDOW, end)
+            self.assertMatches(cache.get("EURUSD", t[s], h[s], l[s], c[s]), reference(h[:end], l[:end], c[:end]))
+
+    def test_forming_bar_update(self):
+        # Only the forming bar moves: closed-bar state is kept, the new tick is reflected
+        t, h, l, c = make_bars(WINDOW)
+        cache = IndicatorCache(EMA_PERIODS)
+        cache.get("EURUSD", t, h, l, c)
+        h2, l2, c2 = h.copy(), l.copy(), c.copy()
+        c2[-1] += 0.0015
+        h2[-1] = max(h2[-1], c2[-1])
+        self.assertMatches(cache.get("EURUSD", t, h2, l2, c2), reference(h2, l2, c2))
+
+    def test_unchanged_bar_returns_same_snapshot(self):
+        t, h, l, c = make_bars(WINDOW)
+        cache = IndicatorCache(EMA_PERIODS)
+        self.assertIs(cache.get("EURUSD", t, h, l, c), cache.get("EURUSD", t, h, l, c))
+
+    def test_gap_falls_back_to_warm_up(self):
+        # Window no longer overlaps the cached bar -> same result as a fresh cache
+        t, h, l, c = make_bars(3 * WINDOW)
+        cache = IndicatorCache(EMA_PERIODS)
+        cache.get("EURUSD", t[:WINDOW], h[:WINDOW], l[:WINDOW], c[:WINDOW])
+        s = slice(2 * WINDOW, 3 * WINDOW)
+        got = cache.get("EURUSD", t[s], h[s], l[s], c[s])
+        self.assertMatches(got, IndicatorCache(EMA_PERIODS).get("EURUSD", t[s], h[s], l[s], c[s]))
+        self.assertMatches(got, reference(h[s], l[s], c[s]))
+
+    def test_short_window(self):
+        t, h, l, c = make_bars(30)
+        self.assertIsNone(IndicatorCache(EMA_PERIODS).get("EURUSD", t, h, l, c))
+
+    def test_keys_are_independent(self):
+        t, h, l, c = make_bars(WINDOW + 5)
+        t2, h2, l2, c2 = make_bars(WINDOW + 5, seed=11)
+        cache = IndicatorCache(EMA_PERIODS)
+        for end in range(WINDOW, WINDOW + 5):
+            s = slice(end - WINDOW, end)
+            a = cache.get("EURUSD", t[s], h[s], l[s], c[s])
+            b = cache.get("GBPUSD", t2[s], h2[s], l2[s], c2[s])
+        self.assertMatches(a, reference(h[:end], l[:end], c[:end]))
+        self.assertMatches(b, reference(h2[:end], l2[:end], c2[:end]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import logging
+import queue
+import unittest
+import numpy as np
+from tests import support # noqa: F401  (stand-ins for MetaTrader5 / Gemini SDK / .env)
+from src.main import LazyQueueHandler
+
+class LazyQueueHandlerTest(unittest.TestCase):
+    def setUp(self):
+        self.q = queue.Queue()
+        self.log = logging.getLogger("tests.lazy_queue")
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        self.handler = LazyQueueHandler(self.q)
+        self.log.addHandler(self.handler)
+        self.addCleanup(self.log.removeHandler, self.handler)
+
+    def test_record_is_not_formatted_on_the_caller(self):
+        self.log.info("Skipping %s: Spread %s > Limit %s", "EURUSD", np.float64(3.5), 3.0)
+        record = self.q.get_nowait()
+        # No merge yet: the listener thread does it
+        self.assertEqual(record.msg, "Skipping %s: Spread %s > Limit %s")
+        self.assertFalse(hasattr(record, "message"))
+        self.assertEqual(record.getMessage(), "Skipping EURUSD: Spread 3.5 > Limit 3.0")
+
+    def test_mutable_args_are_snapshot(self):
+        trades = [1]
+        self.log.info("open: %s", trades)
+        trades.append(2)
+        self.assertEqual(self.q.get_nowait().getMessage(), "open: [1]")
+
+    def test_mapping_args(self):
+        levels = {"support": 1.0}
+        self.log.info("%(levels)s", {"levels": levels})
+        levels["resistance"] = 2.0
+        self.assertEqual(self.q.get_nowait().getMessage(), "{'support': 1.0}")
+
+if __name__ == "__main__":
+    unittest.main()
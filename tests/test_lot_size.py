@@ -0,0 +1,60 @@
+import unittest
+from collections import namedtuple
+from types import SimpleNamespace
+from unittest import mock
+from tests import support # noqa: F401  (stand-ins for MetaTrader5 / .env)
+from src.modules import broker
+from src.modules.broker import MT5Broker
+
+Account = namedtuple("Account", "balance equity")
+SymbolInfo = namedtuple("SymbolInfo", "trade_tick_value")
+
+def meta(volume_min=0.01, volume_max=100.0, volume_step=0.01):
+    return SimpleNamespace(tick_size=0.00001, volume_min=volume_min, volume_max=volume_max, volume_step=volume_step)
+
+class LotSizeTest(unittest.TestCase):
+    """$10,000 at 1% risk on a 5-digit pair worth $1 per tick per lot: 0.4 lots at a 25-pip stop."""
+    def setUp(self):
+        self.tick_value = 1.0
+        for name, fn in (("account_info", lambda: Account(10000.0, 10000.0)),
+                         ("symbol_info", lambda s: SymbolInfo(self.tick_value))):
+            patcher = mock.patch.object(broker.mt5, name, fn, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.broker = MT5Broker()
+        self.broker._sym_meta["EURUSD"] = meta()
+
+    def lots(self, sl_dist, entry=1.2500, risk=1.0):
+        return self.broker.calculate_lot_size("EURUSD", risk, entry - sl_dist, entry)
+
+    def test_exact_size(self):
+        self.assertEqual(self.lots(0.0025), 0.4)
+
+    def test_floors_to_step(self):
+        # Raw 0.379 lots: rounding would give 0.38 and risk more than 1%
+        self.assertEqual(self.lots(0.001 / 0.379), 0.37)
+
+    def test_coarse_step(self):
+        self.broker._sym_meta["EURUSD"] = meta(volume_min=0.1, volume_step=0.1)
+        # Raw 0.3 exactly: must not drop to 0.2 on float error
+        self.assertEqual(self.lots(0.001 / 0.3), 0.3)
+        self.assertEqual(self.lots(0.001 / 0.39), 0.3)
+
+    def test_clamped_to_volume_limits(self):
+        self.broker._sym_meta["EURUSD"] = meta(volume_min=0.1, volume_max=1.0)
+        self.assertEqual(self.lots(0.0500), 0.1) # raw 0.02
+        self.assertEqual(self.lots(0.0001), 1.0) # raw 10
+
+    def test_zero_stop_distance(self):
+        self.assertEqual(self.lots(0.0), 0.01)
+
+    def test_zero_tick_value(self):
+        self.tick_value = 0.0
+        self.assertEqual(self.lots(0.0025), 0.01)
+
+    def test_missing_account(self):
+        with mock.patch.object(broker.mt5, "account_info", lambda: None):
+            self.assertEqual(self.lots(0.0025), 0.01)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+from collections import namedtuple
+from unittest import mock
+from tests import support # noqa: F401  (stand-ins for MetaTrader5 / Gemini SDK / .env)
+import src.main
+from src.main import TradingBot
+
+Position = namedtuple("Position", "ticket symbol type price_open sl tp volume profit comment")
+Tick = namedtuple("Tick", "bid ask")
+
+BUY, SELL = 0, 1
+
+def buy(ticket, r, sl_dist=0.0100, volume=1.0, symbol="EURUSD"):
+    """BUY whose stop is `sl_dist` away and whose current bid (1.2500) sits at `r` R."""
+    entry = 1.2500 - r * sl_dist
+    return Position(ticket, symbol, BUY, entry, entry - sl_dist, 0.0, volume, 0.0, "AI-Quant-V6")
+
+def sell(ticket, r, sl_dist=0.0100, volume=1.0, symbol="EURUSD"):
+    entry = 1.2502 + r * sl_dist
+    return Position(ticket, symbol, SELL, entry, entry + sl_dist, 0.0, volume, 0.0, "AI-Quant-V6")
+
+class PositionManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = TradingBot()
+        self.addCleanup(self.bot._executor.shutdown)
+        self.bot.broker = mock.Mock()
+        self.bot.broker.has_partial_close.return_value = False
+        self.bot.broker.close_partial.return_value = True
+        self.bot.notifier = mock.Mock()
+        self.ticks = {"EURUSD": Tick(1.2500, 1.2502)}
+        patcher = mock.patch.object(src.main.mt5, "symbol_info_tick", lambda s: self.ticks.get(s), create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cycle(self, *positions):
+        self.bot._cycle_cache = {"positions": list(positions)}
+        self.bot.manage_positions()
+
+    def partials(self):
+        return [c.args for c in self.bot.broker.close_partial.call_args_list]
+
+    def breakevens(self):
+        return [(c.args[0], c.kwargs["sl"]) for c in self.bot.broker.modify_position.call_args_list]
+
+class RiskRuleTest(PositionManagerTestCase):
+    def test_below_one_r_does_nothing(self):
+        self.cycle(buy(1, 0.9), sell(2, 0.9))
+        self.assertEqual(self.partials(), [])
+        self.assertEqual(self.breakevens(), [])
+
+    def test_partial_at_one_r(self):
+        self.cycle(buy(1, 1.0))
+        self.assertEqual(self.partials(), [(1, 0.4)])
+        self.assertEqual(self.breakevens(), [])
+
+    def test_breakeven_and_partial_at_one_point_two_r(self):
+        p = buy(1, 1.2)
+        self.cycle(p)
+        self.assertEqual(self.breakevens(), [(1, p.price_open)])
+        self.assertEqual(self.partials(), [(1, 0.4)])
+
+    def test_sell_side_uses_ask(self):
+        p = sell(1, 1.2)
+        self.cycle(p)
+        self.assertEqual(self.breakevens(), [(1, p.price_open)])
+        self.assertEqual(self.partials(), [(1, 0.4)])
+
+    def test_stop_already_past_entry_is_left_alone(self):
+        # Stop trailed above entry: well past 1.2R on the remaining distance, no BE move
+        self.cycle(Position(1, "EURUSD", BUY, 1.2400, 1.2450, 0.0, 1.0, 0.0, "AI-Quant-V6"))
+        self.assertEqual(self.breakevens(), [])
+
+    def test_no_stop_loss_is_ignored(self):
+        self.cycle(buy(1, 3.0)._replace(sl=0.0))
+        self.assertEqual(self.partials(), [])
+        self.assertEqual(self.breakevens(), [])
+
+    def test_missing_tick_is_ignored(self):
+        self.cycle(buy(1, 3.0, symbol="GBPUSD"))
+        self.assertEqual(self.partials(), [])
+        self.assertEqual(self.breakevens(), [])
+
+    def test_only_triggered_trades_act(self):
+        self.cycle(buy(1, 0.2), buy(2, 1.1, volume=0.5), sell(3, -0.5), sell(4, 1.5))
+        self.assertEqual(self.partials(), [(2, 0.2), (4, 0.4)])
+        self.assertEqual([t for t, _ in self.breakevens()], [4])
+
+class PartialTrackingTest(PositionManagerTestCase):
+    def test_partial_taken_once(self):
+        p = buy(1, 1.1)
+        self.cycle(p)
+        # The remaining position keeps its opening comment; volume is what's left
+        self.cycle(p._replace(volume=0.6))
+        self.cycle(p._replace(volume=0.6))
+        self.assertEqual(self.partials(), [(1, 0.4)])
+        self.assertEqual(self.bot.notifier.send.call_count, 1)
+
+    def test_partial_before_restart_is_not_repeated(self):
+        self.bot.broker.has_partial_close.return_value = True
+        self.cycle(buy(1, 1.1))
+        self.cycle(buy(1, 1.1))
+        self.assertEqual(self.partials(), [])
+        # History is read once, then the ticket is known
+        self.assertEqual(self.bot.broker.has_partial_close.call_count, 1)
+
+    def test_failed_partial_is_retried(self):
+        self.bot.broker.close_partial.return_value = False
+        self.cycle(buy(1, 1.1))
+        self.assertNotIn(1, self.bot._partial_taken)
+        self.bot.notifier.send.assert_not_called()
+        self.bot.broker.close_partial.return_value = True
+        self.cycle(buy(1, 1.1))
+        self.assertEqual(self.partials(), [(1, 0.4), (1, 0.4)])
+        self.assertIn(1, self.bot._partial_taken)
+
+    def test_too_small_to_split(self):
+        self.cycle(buy(1, 1.1, volume=0.01))
+        self.cycle(buy(1, 1.1, volume=0.01))
+        self.assertEqual(self.partials(), [])
+        self.bot.broker.has_partial_close.assert_not_called()
+
+    def test_closed_tickets_are_forgotten(self):
+        self.cycle(buy(1, 1.1), buy(2, 1.1))
+        self.cycle(buy(2, 1.1))
+        self.assertEqual(self.bot._partial_taken, {2})
+        self.cycle()
+        self.assertEqual(self.bot._partial_taken, set())
+
+if __name__ == "__main__":
+    unittest.main()
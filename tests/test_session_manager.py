@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+from tests import support # noqa: F401  (stand-ins for MetaTrader5 / Gemini SDK / .env)
+from src.config.settings import settings
+from src.modules import session_manager
+from src.modules.session_manager import SessionManager
+
+DAY = 1_700_006_400 # 2023-11-15 00:00:00 UTC
+OPEN, CLOSE = settings.TRADING_HOURS_UTC
+
+def at(hours):
+    return DAY + int(hours * 3600)
+
+class SessionTransitionTest(unittest.TestCase):
+    def update(self, sm, hours):
+        with mock.patch.object(session_manager.time, "time", return_value=at(hours)):
+            sm.update_session_status()
+
+    def test_before_open(self):
+        sm = SessionManager()
+        self.update(sm, OPEN - 0.5)
+        self.assertEqual(sm.current_session, "CLOSED")
+        self.assertEqual(sm.next_transition_ts, at(OPEN))
+
+    def test_open_boundary(self):
+        sm = SessionManager()
+        self.update(sm, OPEN)
+        self.assertEqual(sm.current_session, "OPEN")
+        self.assertEqual(sm.next_transition_ts, at(CLOSE))
+
+    def test_last_second_open(self):
+        sm = SessionManager()
+        self.update(sm, CLOSE - 1 / 3600)
+        self.assertEqual(sm.current_session, "OPEN")
+        self.assertEqual(sm.next_transition_ts, at(CLOSE))
+
+    def test_close_boundary_rolls_to_next_day(self):
+        sm = SessionManager()
+        for hours in (CLOSE, 23.99):
+            self.update(sm, hours)
+            self.assertEqual(sm.current_session, "CLOSED")
+            self.assertEqual(sm.next_transition_ts, at(24 + OPEN))
+
+    def test_bias_kept_while_open_and_reset_on_close(self):
+        sm = SessionManager()
+        self.update(sm, OPEN + 1)
+        sm.strategic_bias = "BULLISH"
+        self.update(sm, OPEN + 2)
+        self.assertEqual(sm.strategic_bias, "BULLISH")
+        self.update(sm, CLOSE)
+        self.assertEqual(sm.strategic_bias, "NEUTRAL")
+
+    def test_first_check_is_forced(self):
+        self.assertEqual(SessionManager().next_transition_ts, 0.0)
+
+class CycleGateTest(unittest.TestCase):
+    def test_closed_cycle_skips_recompute_until_transition(self):
+        from src.main import TradingBot
+        bot = TradingBot()
+        self.addCleanup(bot._executor.shutdown)
+        bot.broker = mock.Mock()
+        bot.session.current_session = "CLOSED"
+        bot.session.next_transition_ts = at(OPEN)
+        with mock.patch.object(SessionManager, "update_session_status") as update, \
+             mock.patch("src.main.time.time", return_value=at(OPEN - 1)):
+            bot.run_cycle()
+            bot.run_cycle()
+        update.assert_not_called()
+        bot.broker.get_account_info.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()